@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# $Id$
+#
+# Copyright (C) 2016  Parsons Government Services ("PARSONS")
+#
+# Permission to use, copy, modify, and distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notices and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND PARSONS DISCLAIMS ALL
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS.  IN NO EVENT SHALL
+# PARSONS BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS
+# OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT,
+# NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION
+# WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Unit tests for the parts of rcynicng that don't need a database.
+"""
+
+import os
+import imp
+import argparse
+import unittest
+
+rcynicng = imp.load_source("rcynicng", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                    "../../rp/rcynic/rcynicng"))
+
+
+class FakeQuery(object):
+    """
+    Stand-in for a two-column values_list() query, recording the
+    size of each filter() call.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def filter(self, **kwargs):
+        (field, values), = kwargs.items()
+        assert field == "sha256__in"
+        self.calls.append(len(values))
+        return [(v, v.upper()) for v in values if not v.startswith("missing")]
+
+
+class SQLInChunkedTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.saved_chunk = rcynicng.sql_in_chunk
+        rcynicng.sql_in_chunk = 3
+
+    def tearDown(self):
+        rcynicng.sql_in_chunk = self.saved_chunk
+
+    def test_chunks(self):
+        q = FakeQuery()
+        values = ["a", "b", "missing-c", "d", "e", "f", "g"]
+        result = rcynicng.sql_in_chunked(q, "sha256", (v for v in values))
+        self.assertEqual(q.calls, [3, 3, 1])
+        self.assertEqual(result, dict((v, v.upper()) for v in values if not v.startswith("missing")))
+
+    def test_exact_multiple(self):
+        q = FakeQuery()
+        rcynicng.sql_in_chunked(q, "sha256", "abcdef")
+        self.assertEqual(q.calls, [3, 3])
+
+    def test_empty(self):
+        q = FakeQuery()
+        self.assertEqual(rcynicng.sql_in_chunked(q, "sha256", []), {})
+        self.assertEqual(q.calls, [])
+
+
+class FakeFetchHistory(object):
+    """
+    Stand-in for the FetchHistory model, without the database.
+    """
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.last_attempt = self.last_success = self.backoff_until = None
+        self.etag = self.last_modified = self.snapshot = None
+        self.failures = 0
+        self.saves = 0
+
+    @property
+    def snapshot_id(self):
+        return None if self.snapshot is None else id(self.snapshot)
+
+    def save(self):
+        self.saves += 1
+
+
+class FakeResponse(object):
+
+    def __init__(self, **headers):
+        self.headers = headers
+
+
+class FetchHistoryTestCase(unittest.TestCase):
+
+    uri = "https://rrdp.example.org/notify.xml"
+
+    # main() normally sets up these module globals; we never call it.
+
+    def setUp(self):
+        rcynicng.FetchHistory = FakeFetchHistory
+        rcynicng.args = argparse.Namespace(fetch_backoff = 60, fetch_backoff_max = 300)
+        rcynicng.Fetcher._fetch_history = dict()
+        self.fetcher = rcynicng.Fetcher(self.uri)
+
+    def backoff(self):
+        h = self.fetcher._history()
+        return (h.backoff_until - h.last_attempt).total_seconds()
+
+    def test_backoff_doubles_up_to_limit(self):
+        self.assertFalse(self.fetcher._backing_off())
+        backoffs = []
+        for i in xrange(5):
+            self.fetcher._record_fetch(False)
+            backoffs.append(self.backoff())
+        self.assertEqual(backoffs, [60, 120, 240, 300, 300])
+        self.assertEqual(self.fetcher._history().failures, 5)
+        self.assertEqual(self.fetcher._history().saves, 5)
+        self.assertTrue(self.fetcher._backing_off())
+
+    def test_success_resets(self):
+        self.fetcher._record_fetch(False)
+        self.fetcher._record_fetch(False)
+        self.fetcher._record_fetch(True)
+        h = self.fetcher._history()
+        self.assertEqual((h.failures, h.backoff_until), (0, None))
+        self.assertEqual(h.last_success, h.last_attempt)
+        self.assertFalse(self.fetcher._backing_off())
+        self.fetcher._record_fetch(False)
+        self.assertEqual(self.backoff(), 60)
+
+    def test_conditional_headers(self):
+        self.assertEqual(self.fetcher._conditional_headers(), {})
+        response = FakeResponse(**{"ETag" : '"abc"', "Last-Modified" : "Tue, 01 Mar 2016 00:00:00 GMT"})
+        self.fetcher._record_fetch(True, response, None)
+        self.assertEqual(self.fetcher._conditional_headers(), {})   # No snapshot, validators useless
+        self.fetcher._record_fetch(True, response, object())
+        self.assertEqual(self.fetcher._conditional_headers(),
+                         {"If-None-Match" : '"abc"', "If-Modified-Since" : "Tue, 01 Mar 2016 00:00:00 GMT"})
+        self.fetcher._record_fetch(False)
+        self.assertEqual(self.fetcher._history().etag, '"abc"')      # Failure keeps validators
+
+
+if __name__ == "__main__":
+    unittest.main()
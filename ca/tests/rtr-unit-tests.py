@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# $Id$
+#
+# Copyright (C) 2016  Parsons Government Services ("PARSONS")
+#
+# Permission to use, copy, modify, and distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notices and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND PARSONS DISCLAIMS ALL
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS.  IN NO EVENT SHALL
+# PARSONS BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS
+# OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT,
+# NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION
+# WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Unit tests for the parts of rpki.rtr that don't need POW or a database.
+"""
+
+import socket
+import unittest
+
+import rpki.rtr.pdus
+import rpki.rtr.query
+import rpki.rtr.server
+import rpki.rtr.channels
+import rpki.rtr.generator
+
+version = max(rpki.rtr.pdus.PDU.version_map)
+
+
+def vrp(asn, prefix, maxlength = None, announce = 1):
+    """
+    Wire format prefix PDU for asn and "address/length" prefix.
+    """
+
+    address, length = prefix.split("/")
+    af = socket.AF_INET6 if ":" in address else socket.AF_INET
+    length = int(length)
+    pdu = rpki.rtr.generator.PrefixPDU.wire_from_vrp(
+        version, asn, socket.inet_pton(af, address), length, length if maxlength is None else maxlength)
+    return rpki.rtr.generator.PDUSet.with_announce(pdu, announce)
+
+
+def axfr(serial, *pdus):
+    result = rpki.rtr.generator.AXFRSet(version = version)
+    result.serial = rpki.rtr.channels.Timestamp(serial)
+    result.extend(pdus)
+    result.sort_and_dedup()
+    return result
+
+
+def ixfr(from_serial, to_serial, *pdus):
+    result = rpki.rtr.generator.IXFRSet(version = version)
+    result.from_serial = rpki.rtr.channels.Timestamp(from_serial)
+    result.to_serial = rpki.rtr.channels.Timestamp(to_serial)
+    result.extend(sorted(pdus, key = lambda pdu: result.with_announce(pdu, 1)))
+    return result
+
+
+class VRPIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = rpki.rtr.query.VRPIndex(axfr(
+            1,
+            vrp(64500, "10.0.0.0/8", 16),
+            vrp(64501, "10.1.0.0/16"),
+            vrp(64502, "10.1.2.0/24"),
+            vrp(64503, "192.0.2.0/24"),
+            vrp(0,     "198.51.100.0/24"),
+            vrp(64504, "2001:db8::/32", 48)))
+
+    def prefixes(self, operation, prefix, asn = None):
+        return sorted((v["prefix"], v["asn"]) for v in self.index.query(operation, prefix, asn)["vrps"])
+
+    def test_covering(self):
+        self.assertEqual(self.prefixes("covering", "10.1.2.0/24"),
+                         [("10.0.0.0/8", 64500), ("10.1.0.0/16", 64501), ("10.1.2.0/24", 64502)])
+        self.assertEqual(self.prefixes("covering", "10.2.0.0/16"), [("10.0.0.0/8", 64500)])
+        self.assertEqual(self.prefixes("covering", "11.0.0.0/8"), [])
+        self.assertEqual(self.prefixes("covering", "2001:db8:1::/48"), [("2001:db8::/32", 64504)])
+
+    def test_covered(self):
+        self.assertEqual(self.prefixes("covered", "10.0.0.0/8"),
+                         [("10.0.0.0/8", 64500), ("10.1.0.0/16", 64501), ("10.1.2.0/24", 64502)])
+        self.assertEqual(self.prefixes("covered", "10.1.0.0/16"),
+                         [("10.1.0.0/16", 64501), ("10.1.2.0/24", 64502)])
+        self.assertEqual(self.prefixes("covered", "10.2.0.0/16"), [])
+        self.assertEqual(self.prefixes("covered", "0.0.0.0/0"),
+                         [("10.0.0.0/8", 64500), ("10.1.0.0/16", 64501), ("10.1.2.0/24", 64502),
+                          ("192.0.2.0/24", 64503), ("198.51.100.0/24", 0)])
+
+    def validate(self, prefix, asn):
+        return self.index.query("validate", prefix, asn)["state"]
+
+    def test_validate(self):
+        self.assertEqual(self.validate("10.1.0.0/16", "AS64501"), "valid")
+        self.assertEqual(self.validate("10.2.0.0/16", 64500),     "valid")
+        self.assertEqual(self.validate("10.2.3.0/24", 64500),     "invalid")   # Longer than maxLength
+        self.assertEqual(self.validate("10.1.2.0/24", 64501),     "invalid")   # Wrong origin
+        self.assertEqual(self.validate("11.0.0.0/8",  64500),     "not-found")
+        self.assertEqual(self.validate("198.51.100.0/24", 0),     "invalid")   # AS0 never valid
+        self.assertEqual(self.validate("2001:db8:1::/48", 64504), "valid")
+
+    def test_bad_queries(self):
+        self.assertRaises(rpki.rtr.query.BadQuery, self.index.query, "covering", "10.0.0.0/33")
+        self.assertRaises(rpki.rtr.query.BadQuery, self.index.query, "covering", "not-a-prefix")
+        self.assertRaises(rpki.rtr.query.BadQuery, self.index.query, "validate", "10.0.0.0/8", "SA64500")
+        self.assertRaises(rpki.rtr.query.BadQuery, self.index.query, "validate", "10.0.0.0/8", None)
+        self.assertRaises(rpki.rtr.query.BadQuery, self.index.query, "bogus", "10.0.0.0/8")
+
+
+class IXFRComposeTestCase(unittest.TestCase):
+
+    def test_compose(self):
+        a = vrp(64500, "10.0.0.0/24")
+        b = vrp(64500, "10.0.1.0/24")
+        c = vrp(64500, "10.0.2.0/24")
+        d = vrp(64500, "10.0.3.0/24")
+        withdraw = lambda pdu: rpki.rtr.generator.PDUSet.with_announce(pdu, 0)
+        first  = ixfr(10, 20, a, withdraw(b), d)
+        second = ixfr(20, 30, withdraw(a), c)
+        result = first.compose(second)
+        self.assertEqual((result.from_serial, result.to_serial), (10, 30))
+        self.assertEqual(list(result), list(ixfr(10, 30, withdraw(b), c, d)))
+
+    def test_compose_matches_direct_diff(self):
+        old = axfr(10, *[vrp(64500, "10.0.%d.0/24" % i) for i in xrange(0, 20)])
+        mid = axfr(20, *[vrp(64500, "10.0.%d.0/24" % i) for i in xrange(5, 25)])
+        new = axfr(30, *[vrp(64500, "10.0.%d.0/24" % i) for i in range(0, 3) + range(10, 30)])
+        self.assertEqual(list(mid.ixfr(old).compose(new.ixfr(mid))), list(new.ixfr(old)))
+
+
+class ReadBufferTestCase(unittest.TestCase):
+
+    def test_compaction(self):
+        b = rpki.rtr.channels.ReadBuffer()
+        b.compact_threshold = 16
+        b.put("x" * 40)
+        self.assertEqual(b.get(10), "x" * 10)
+        b.put("y" * 10)
+        self.assertEqual(b.offset, 10)                  # Below threshold, not compacted
+        self.assertEqual(b.get(20), "x" * 20)
+        b.put("z" * 10)
+        self.assertEqual((b.offset, len(b.buffer)), (0, 30))
+        self.assertEqual(b.get(b.available()), "x" * 10 + "y" * 10 + "z" * 10)
+        b.put("w")
+        self.assertEqual((b.offset, len(b.buffer)), (0, 1))
+
+    def test_need(self):
+        b = rpki.rtr.channels.ReadBuffer()
+        b.need = 8
+        b.put("1234")
+        self.assertFalse(b.ready())
+        self.assertEqual(b.needed(), 4)
+        b.put("5678")
+        self.assertTrue(b.ready())
+
+
+class KickMessageTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        msg = rpki.rtr.server.kick_message(1, 1234567890, 42)
+        self.assertEqual(rpki.rtr.server.parse_kick_message(msg), (1, 1234567890, 42))
+
+    def test_old_or_bad(self):
+        for msg in ("", "Hello", "rpki-rtr-kick 1 2", "rpki-rtr-kick 1 2 x", "other-tag 1 2 3", None):
+            self.assertIsNone(rpki.rtr.server.parse_kick_message(msg))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3100,6 +3100,7 @@ x509_object_sign(x509_object *self, PyObject *args)
   asymmetric_object *asym;
   int digest_type = SHA256_DIGEST;
   const EVP_MD *digest_method = NULL;
+  int ok;
 
   ENTERING(x509_object_sign);
 
@@ -3109,7 +3110,17 @@ x509_object_sign(x509_object *self, PyObject *args)
   if ((digest_method = evp_digest_factory(digest_type)) == NULL)
     lose("Unsupported digest algorithm");
 
-  if (!X509_sign(self->x509, asym->pkey, digest_method))
+  /*
+   * The private key operation is the expensive part, so let other
+   * Python threads run while we do it.  The caller must not touch
+   * this object from another thread until we return.
+   */
+
+  Py_BEGIN_ALLOW_THREADS
+  ok = X509_sign(self->x509, asym->pkey, digest_method);
+  Py_END_ALLOW_THREADS
+
+  if (!ok)
     lose_openssl_error("Couldn't sign certificate");
 
   Py_RETURN_NONE;
@@ -5656,6 +5667,7 @@ crl_object_sign(crl_object *self, PyObject *args)
   asymmetric_object *asym;
   int digest_type = SHA256_DIGEST;
   const EVP_MD *digest_method = NULL;
+  int ok;
 
   ENTERING(crl_object_sign);
 
@@ -5665,7 +5677,11 @@ crl_object_sign(crl_object *self, PyObject *args)
   if ((digest_method = evp_digest_factory(digest_type)) == NULL)
     lose("Unsupported digest algorithm");
 
-  if (!X509_CRL_sign(self->crl, asym->pkey, digest_method))
+  Py_BEGIN_ALLOW_THREADS
+  ok = X509_CRL_sign(self->crl, asym->pkey, digest_method);
+  Py_END_ALLOW_THREADS
+
+  if (!ok)
     lose_openssl_error("Couldn't sign CRL");
 
   Py_RETURN_NONE;
@@ -6384,8 +6400,14 @@ asymmetric_object_generate_rsa(PyTypeObject *type, PyObject *args, PyObject *kwd
 
   if ((ctx = EVP_PKEY_CTX_new_id(EVP_PKEY_RSA, NULL)) == NULL ||
       EVP_PKEY_keygen_init(ctx) <= 0 ||
-      EVP_PKEY_CTX_set_rsa_keygen_bits(ctx, key_size) <= 0 ||
-      EVP_PKEY_keygen(ctx, &self->pkey) <= 0)
+      EVP_PKEY_CTX_set_rsa_keygen_bits(ctx, key_size) <= 0)
+    lose_openssl_error("Couldn't generate new RSA key");
+
+  Py_BEGIN_ALLOW_THREADS
+  ok = EVP_PKEY_keygen(ctx, &self->pkey) > 0;
+  Py_END_ALLOW_THREADS
+
+  if (!ok)
     lose_openssl_error("Couldn't generate new RSA key");
 
   ok = 1;
@@ -7280,9 +7302,20 @@ cms_object_sign_helper(cms_object *self,
     }
   }
 
-  if (!CMS_final(cms, bio, NULL, flags))
+  /*
+   * CMS_final() is where the signature happens, so release the GIL.
+   * Everything it touches belongs to this call.
+   */
+
+  Py_BEGIN_ALLOW_THREADS
+  ok = CMS_final(cms, bio, NULL, flags);
+  Py_END_ALLOW_THREADS
+
+  if (!ok)
     lose_openssl_error("Couldn't finalize CMS signatures");
 
+  ok = 0;
+
   assert_no_unhandled_openssl_errors();
 
   CMS_ContentInfo_free(self->cms);
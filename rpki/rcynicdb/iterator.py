@@ -47,6 +47,15 @@ def authenticated_objects(directory_tree = None, uri_suffix = None, class_map =
                     yield uri, _uri_to_class(uri, class_map).derReadFile(fn)
         return
 
+    auth = latest_authenticated()
+    if auth is None:
+        return
+    
+    q = auth.rpkiobject_set
+    for obj in q.filter(uri__endswith = uri_suffix) if uri_suffix else q.all():
+        yield obj.uri, _uri_to_class(obj.uri, class_map).derRead(obj.der)
+
+def _setup_django():
     global initialized_django
     if not initialized_django:
         os.environ.update(DJANGO_SETTINGS_MODULE = "rpki.django_settings.rcynic")
@@ -54,11 +63,34 @@ def authenticated_objects(directory_tree = None, uri_suffix = None, class_map =
         django.setup()
         initialized_django = True
 
+def latest_authenticated():
+    """
+    Return the most recent authenticated set from the rcynicng
+    database, or None if there isn't one.
+    """
+
+    _setup_django()
     import rpki.rcynicdb
-    auth = rpki.rcynicdb.models.Authenticated.objects.order_by("-started").first()
-    if auth is None:
-        return
-    
-    q = auth.rpkiobject_set
-    for obj in q.filter(uri__endswith = uri_suffix) if uri_suffix else q.all():
-        yield obj.uri, _uri_to_class(obj.uri, class_map).derRead(obj.der)
+    return rpki.rcynicdb.models.Authenticated.objects.order_by("-started").first()
+
+def authenticated_digests(auth, uri_suffix):
+    """
+    Iterate over (sha256, uri) pairs for the objects in an
+    authenticated set whose URIs end with uri_suffix, without pulling
+    the DER for any of them.
+    """
+
+    return auth.rpkiobject_set.filter(uri__endswith = uri_suffix).values_list("sha256", "uri").iterator()
+
+def authenticated_der(auth, digests, chunk_size = 500):
+    """
+    Iterate over (sha256, uri, der) tuples for the objects in an
+    authenticated set with the given SHA-256 digests, querying in
+    chunks to stay under database limits on query parameters.
+    """
+
+    digests = list(digests)
+    for i in xrange(0, len(digests), chunk_size):
+        q = auth.rpkiobject_set.filter(sha256__in = digests[i : i + chunk_size])
+        for sha256, uri, der in q.values_list("sha256", "uri", "der").iterator():
+            yield sha256, uri, str(der)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rcynicdb', '0003_auto_20160301_0333'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FetchHistory',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('uri', models.TextField()),
+                ('uri_sha256', models.SlugField(unique=True, max_length=64)),
+                ('last_attempt', models.DateTimeField(null=True)),
+                ('last_success', models.DateTimeField(null=True)),
+                ('failures', models.IntegerField(default=0)),
+                ('backoff_until', models.DateTimeField(null=True)),
+                ('etag', models.TextField(null=True)),
+                ('last_modified', models.TextField(null=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.SET_NULL, to='rcynicdb.RRDPSnapshot', null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HostHistory',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('scheme', models.SlugField(max_length=10)),
+                ('host', models.CharField(max_length=255)),
+                ('dead_until', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='hosthistory',
+            unique_together=set([('scheme', 'host')]),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rcynicdb', '0004_fetchhistory_hosthistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicationPoint',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('fingerprint', models.SlugField(max_length=64)),
+                ('valid_until', models.DateTimeField()),
+                ('accepted', models.ManyToManyField(to='rcynicdb.RPKIObject')),
+                ('authenticated', models.ForeignKey(to='rcynicdb.Authenticated')),
+            ],
+        ),
+    ]
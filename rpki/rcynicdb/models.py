@@ -15,6 +15,8 @@
 
 # Django ORM models for rcynicng.
 
+import hashlib
+
 from django.db import models
 
 # HTTP/HTTPS/RSYNC fetch event.
@@ -57,6 +59,52 @@ class RRDPSnapshot(models.Model):
             return "<RRDPSnapshot: {}>".format(id(self))
 
 
+# Per-URI fetch history, so that HTTP validators, back-off timers and
+# rsync freshness survive from one run to the next.  The snapshot
+# link tells us which RRDP state the saved HTTP validators describe;
+# if garbage collection removes that snapshot, we stop sending them.
+# URIs can be longer than any database will index, so uniqueness is
+# enforced on a hash of the URI, which save() fills in.
+
+class FetchHistory(models.Model):
+    uri           = models.TextField()
+    uri_sha256    = models.SlugField(max_length = 64, unique = True) # hex SHA-256
+    last_attempt  = models.DateTimeField(null = True)
+    last_success  = models.DateTimeField(null = True)
+    failures      = models.IntegerField(default = 0)
+    backoff_until = models.DateTimeField(null = True)
+    etag          = models.TextField(null = True)
+    last_modified = models.TextField(null = True)
+    snapshot      = models.ForeignKey(RRDPSnapshot, null = True, on_delete = models.SET_NULL)
+
+    def __repr__(self):
+        try:
+            return "<FetchHistory: {0.uri} last_success {0.last_success} failures {0.failures}>".format(self)
+        except:
+            return "<FetchHistory: {}>".format(id(self))
+
+    def save(self, *args, **kwargs):
+        uri = self.uri.encode("utf-8") if isinstance(self.uri, unicode) else self.uri
+        self.uri_sha256 = hashlib.sha256(uri).hexdigest()
+        super(FetchHistory, self).save(*args, **kwargs)
+
+# Hosts which recently failed at the network level.
+
+class HostHistory(models.Model):
+    scheme     = models.SlugField(max_length = 10)
+    host       = models.CharField(max_length = 255)
+    dead_until = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("scheme", "host")
+
+    def __repr__(self):
+        try:
+            return "<HostHistory: {0.scheme}://{0.host} dead until {0.dead_until}>".format(self)
+        except:
+            return "<HostHistory: {}>".format(id(self))
+
+
 # RPKI objects.
 #
 # Might need to add an on_delete argument to the ForeignKey for the
@@ -94,3 +142,20 @@ class RPKIObject(models.Model):
             return "<RPKIObject: uri {0.uri} sha256 {0.sha256} ski {0.ski} aki {0.aki} retrieved {0.retrieved!r}>".format(self)
         except:
             return "<RPKIObject: {}>".format(id(self))
+
+# Publication point input fingerprints and results, for incremental
+# revalidation.  If nothing a publication point's validation depends
+# on has changed, and nothing in the result has expired, neither has
+# the result.
+
+class PublicationPoint(models.Model):
+    fingerprint   = models.SlugField(max_length = 64) # hex SHA-256
+    valid_until   = models.DateTimeField()
+    authenticated = models.ForeignKey(Authenticated)
+    accepted      = models.ManyToManyField(RPKIObject)
+
+    def __repr__(self):
+        try:
+            return "<PublicationPoint: fingerprint {0.fingerprint} valid_until {0.valid_until}>".format(self)
+        except:
+            return "<PublicationPoint: {}>".format(id(self))
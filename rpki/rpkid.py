@@ -23,10 +23,12 @@ RPKI CA engine.
 """
 
 import os
+import json
 import time
 import random
 import logging
 import weakref
+import collections
 import argparse
 import urlparse
 
@@ -52,6 +54,8 @@ import rpki.log
 import rpki.daemonize
 
 import rpki.rpkid_tasks
+import rpki.rpkid_keypool
+import rpki.signer
 
 
 logger = logging.getLogger(__name__)
@@ -71,8 +75,12 @@ class main(object):
         self.irdbd_cms_timestamp = None
         self.irbe_cms_timestamp = None
 
-        self.task_queue = tornado.queues.Queue()
-        self.task_ready = set()
+        self.task_queue   = tornado.queues.Queue()
+        self.task_ready   = set()
+        self.task_running = {}
+        self.task_held    = {}
+        self.task_slots   = None
+        self.task_stats   = {}
 
         self.http_client_serialize = weakref.WeakValueDictionary()
 
@@ -154,6 +162,25 @@ class main(object):
 
         self.cron_period = self.cfg.getint("cron-period", 1800)
 
+        self.task_concurrency = self.cfg.getint("task-concurrency", 8)
+        self.task_slots = tornado.locks.Semaphore(self.task_concurrency)
+
+        self.key_pool = None
+        key_pool_size = self.cfg.getint("key-pool-size", 100)
+        if key_pool_size > 0 and rpki.x509.generate_insecure_debug_only_rsa_key is None:
+            self.key_pool = rpki.rpkid_keypool.KeyPool(
+                passphrase = self.cfg.get("key-pool-passphrase",
+                                          rpki.x509.sha256(self.rpkid_key.get_DER()).encode("hex")),
+                target     = key_pool_size,
+                workers    = self.cfg.getint("key-pool-workers", 2))
+            rpki.x509.rsa_key_pool = self.key_pool
+            logger.debug("Scheduling RSA key pool refill to %d keys", key_pool_size)
+            tornado.ioloop.IOLoop.current().add_callback(self.key_pool.refill)
+
+        # Start signing threads after forking key pool workers.
+
+        rpki.signer.configure(self.cfg.getint("signing-threads", 4))
+
         if self.use_internal_cron:
             logger.debug("Scheduling initial cron pass in %s seconds", self.initial_delay)
             tornado.ioloop.IOLoop.current().spawn_callback(self.cron_loop)
@@ -178,10 +205,20 @@ class main(object):
             def post(self):
                 yield rpkid.cronjob_handler(self)
 
+        class TaskStatusHandler(tornado.web.RequestHandler): # pylint: disable=W0223
+            def get(self):
+                rpkid.task_status_handler(self)
+
+        class KeyPoolStatusHandler(tornado.web.RequestHandler): # pylint: disable=W0223
+            def get(self):
+                rpkid.key_pool_status_handler(self)
+
         application = tornado.web.Application((
             (r"/left-right",                                  LeftRightHandler),
             (r"/up-down/([-a-zA-Z0-9_]+)/([-a-zA-Z0-9_]+)",   UpDownHandler),
-            (r"/cronjob",                                     CronjobHandler)))
+            (r"/cronjob",                                     CronjobHandler),
+            (r"/task-status",                                 TaskStatusHandler),
+            (r"/key-pool-status",                             KeyPoolStatusHandler)))
 
         application.listen(
             address = self.http_server_host,
@@ -199,25 +236,116 @@ class main(object):
                 logger.debug("Task %r already queued", task)
             else:
                 logger.debug("Adding %r to task queue", task)
+                task.queued = time.time()
                 self.task_queue.put(task)
                 self.task_ready.add(task)
 
     @tornado.gen.coroutine
     def task_loop(self):
         """
-        Asynchronous infinite loop to run background tasks.
+        Asynchronous infinite loop to dispatch background tasks.
+
+        Tasks for different tenants run concurrently, up to the
+        task-concurrency limit, so that one tenant's slow parent or
+        repository doesn't stall everybody else.  Tasks for the same
+        tenant still run one at a time: a task whose tenant is busy is
+        held until the tenant's running task finishes.
         """
 
-        logger.debug("Starting task loop")
+        logger.debug("Starting task loop, concurrency %d", self.task_concurrency)
 
         while True:
             task = None
             try:
                 task = yield self.task_queue.get()
-                self.task_ready.discard(task)
-                yield task.start()
+                tenant = task.tenant.pk
+                if tenant in self.task_running:
+                    logger.debug("Holding %r until %r finishes", task, self.task_running[tenant])
+                    self.task_held.setdefault(tenant, collections.deque()).append(task)
+                    continue
+                yield self.task_slots.acquire()
+                self.task_running[tenant] = task
+                tornado.ioloop.IOLoop.current().spawn_callback(self.task_run, tenant, task)
             except:
-                logger.exception("Unhandled exception from %r", task)
+                logger.exception("Unhandled exception dispatching %r", task)
+
+    @tornado.gen.coroutine
+    def task_run(self, tenant, task):
+        """
+        Run one task, then any tasks for the same tenant which were held
+        while it ran, then give up our concurrency slot.
+        """
+
+        try:
+            while task is not None:
+                self.task_running[tenant] = task
+                self.task_ready.discard(task)
+                started = time.time()
+                try:
+                    yield task.start()
+                except:
+                    logger.exception("Unhandled exception from %r", task)
+                self.task_record(task, started - task.queued, time.time() - started)
+                held = self.task_held.get(tenant)
+                task = held.popleft() if held else None
+                if held is not None and not held:
+                    del self.task_held[tenant]
+        finally:
+            del self.task_running[tenant]
+            self.task_slots.release()
+
+    def task_blocked(self, task):
+        """
+        Whether any task is waiting on the one given: a held task for
+        the same tenant, or, if every concurrency slot is in use, a
+        queued task for a tenant with nothing running.  Postponed
+        tasks don't count, lest long tasks take turns postponing each
+        other forever.
+        """
+
+        tenant = task.tenant.pk
+        if any(not t.postponed for t in self.task_held.get(tenant, ())):
+            return True
+        return len(self.task_running) >= self.task_concurrency and any(
+            not t.postponed and t.tenant.pk not in self.task_running for t in self.task_ready)
+
+    def task_record(self, task, waited, ran):
+        """
+        Accumulate queue wait and run time statistics for a task.
+        """
+
+        logger.debug("%r: Waited %.3fs, ran %.3fs", task, waited, ran)
+        stats = self.task_stats.setdefault(task.__class__.__name__, dict(
+            runs = 0, wait_total = 0.0, wait_max = 0.0, run_total = 0.0, run_max = 0.0))
+        stats["runs"]       += 1
+        stats["wait_total"] += waited
+        stats["wait_max"]    = max(stats["wait_max"], waited)
+        stats["run_total"]  += ran
+        stats["run_max"]     = max(stats["run_max"], ran)
+
+    def task_status_handler(self, handler):
+        """
+        Report task scheduler state as JSON: queue depth, tasks running
+        and held, and per-task-class latency statistics.
+        """
+
+        handler.set_header("Content-Type", "application/json")
+        handler.finish(json.dumps(dict(
+            concurrency = self.task_concurrency,
+            queued      = self.task_queue.qsize(),
+            held        = sum(len(held) for held in self.task_held.itervalues()),
+            running     = [repr(task) for task in self.task_running.itervalues()],
+            signing     = 0 if rpki.signer.pool is None else rpki.signer.pool.pending,
+            tasks       = self.task_stats)))
+
+    def key_pool_status_handler(self, handler):
+        """
+        Report RSA key pool depth and hit/miss counts as JSON.
+        """
+
+        handler.set_header("Content-Type", "application/json")
+        handler.finish(json.dumps(dict(enabled = False) if self.key_pool is None else
+                                  dict(enabled = True, **self.key_pool.status())))
 
     @tornado.gen.coroutine
     def cron_loop(self):
@@ -329,7 +457,7 @@ class main(object):
 
         q_tags = set(q_pdu.tag for q_pdu in q_msg)
 
-        q_der = rpki.left_right.cms_msg().wrap(q_msg, self.rpkid_key, self.rpkid_cert)
+        q_der = yield rpki.signer.run(rpki.left_right.cms_msg().wrap, q_msg, self.rpkid_key, self.rpkid_cert)
 
         http_request = tornado.httpclient.HTTPRequest(
             url             = self.irdb_url,
@@ -594,8 +722,9 @@ class main(object):
                         r_pdu.set("tenant_handle", error_tenant_handle)
                     break
 
+            r_der = yield rpki.signer.run(rpki.left_right.cms_msg().wrap, r_msg, self.rpkid_key, self.rpkid_cert)
             handler.set_status(200)
-            handler.finish(rpki.left_right.cms_msg().wrap(r_msg, self.rpkid_key, self.rpkid_cert))
+            handler.finish(r_der)
 
         except Exception, e:
             logger.exception("Unhandled exception serving left-right request")
@@ -642,6 +771,13 @@ class publication_queue(object):
     own completion callback.  Eventually we want to publish everything
     we've accumulated, at which point we need to iterate over the
     collection and do repository.call_pubd() for each repository.
+
+    We also accumulate the set of CADetails which need a new CRL and
+    manifest.  Callers mark a CADetail dirty after each change rather
+    than regenerating on the spot, and call_pubd() generates one CRL
+    and manifest per dirty CADetail just before publishing, so a batch
+    of changes under one CADetail costs one CRL and manifest no matter
+    how many changes there were.
     """
 
     # At present, ._inplay and .inplay() are debugging tools only.  If
@@ -660,6 +796,18 @@ class publication_queue(object):
         self.msgs = {}
         self.handlers = {}
         self.uris = {}
+        self.dirty = {}
+
+    def mark_dirty(self, ca_detail):
+        """
+        Note that ca_detail needs a new CRL and manifest before we next
+        publish.  If several different objects for the same CADetail are
+        marked, the last one wins, since it's the one the caller is
+        most likely to have modified.
+        """
+
+        logger.debug("Marking %r for CRL and manifest regeneration", ca_detail)
+        self.dirty[ca_detail.pk] = ca_detail
 
     def inplay(self, uri):
         who = self._inplay.get(uri, self)
@@ -724,6 +872,10 @@ class publication_queue(object):
 
     @tornado.gen.coroutine
     def call_pubd(self):
+        if self.dirty:
+            logger.debug("Generating CRLs and manifests for %d ca_details", len(self.dirty))
+            yield [ca_detail.generate_crl_and_manifest(publisher = self)
+                   for ca_detail in self.dirty.values()]
         for rid in self.repositories:
             logger.debug("Calling pubd[%r]", self.repositories[rid])
             try:
@@ -792,4 +944,4 @@ class publication_queue(object):
         return sum(len(self.msgs[rid]) for rid in self.repositories)
 
     def empty(self):
-        return not self.msgs
+        return not self.msgs and not self.dirty
@@ -0,0 +1,156 @@
+# $Id$
+#
+# Copyright (C) 2015-2016  Parsons Government Services ("PARSONS")
+#
+# Permission to use, copy, modify, and distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notices and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND PARSONS DISCLAIMS ALL
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS.  IN NO EVENT SHALL
+# PARSONS BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS
+# OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT,
+# NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION
+# WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Pool of pre-generated RSA keys for rpkid.
+
+rpkid burns through RSA keys: every ROA and Ghostbuster gets a fresh
+EE key each time it's generated, and every new CADetail needs two.
+Generating a key takes long enough that doing it on the IOLoop for a
+bulk ROA change stalls everything else, so we generate keys ahead of
+time in worker processes and park them, encrypted, in rpkidb.
+"""
+
+import logging
+import multiprocessing
+
+import tornado.ioloop
+
+import rpki.POW
+import rpki.x509
+import rpki.sundial
+
+logger = logging.getLogger(__name__)
+
+
+def generate_key(keylength, passphrase):
+    """
+    Worker process side: generate one key, return it as encrypted PEM.
+    Exceptions are logged and turned into None, because Python 2's
+    multiprocessing.Pool has no way to report errors to a callback.
+    """
+
+    try:
+        return rpki.POW.Asymmetric.generateRSA(keylength).pemWritePrivate(passphrase)
+    except:
+        logger.exception("Couldn't generate %d-bit RSA key", keylength)
+        return None
+
+
+class KeyPool(object):
+    """
+    Pool of pre-generated RSA keys.  get() hands out a key from the
+    pool if there is one, and kicks off background generation to top
+    the pool back up to its target depth.  If the pool is empty, get()
+    returns None and the caller generates a key the slow way.
+    """
+
+    def __init__(self, passphrase, target, workers, keylength = 2048):
+        self.passphrase = passphrase
+        self.target     = target
+        self.keylength  = keylength
+        self.pending    = 0
+        self.hits       = 0
+        self.misses     = 0
+        self.generated  = 0
+        self.depth      = None
+        self.ioloop     = tornado.ioloop.IOLoop.current()
+        self.workers    = multiprocessing.Pool(workers)
+
+    def __len__(self):
+        if self.depth is None:
+            import rpki.rpkidb.models
+            self.depth = rpki.rpkidb.models.KeyPoolEntry.objects.filter(keylength = self.keylength).count()
+        return self.depth
+
+    def refill(self):
+        """
+        Start enough background key generations to bring the pool up to
+        its target depth.
+        """
+
+        while len(self) + self.pending < self.target:
+            self.pending += 1
+            self.workers.apply_async(generate_key, (self.keylength, self.passphrase),
+                                     callback = self._callback)
+
+    def _callback(self, pem):
+        # Called in multiprocessing.Pool's result thread, hand off to IOLoop.
+        self.ioloop.add_callback(self.store, pem)
+
+    def store(self, pem):
+        """
+        Save a newly generated key in the pool.
+        """
+
+        import rpki.rpkidb.models
+        self.pending -= 1
+        if pem is None:
+            return
+        rpki.rpkidb.models.KeyPoolEntry.objects.create(
+            keylength       = self.keylength,
+            private_key_pem = pem,
+            created         = rpki.sundial.now())
+        if self.depth is not None:
+            self.depth += 1
+        self.generated += 1
+
+    def get(self, keylength):
+        """
+        Take a key from the pool.  Returns an rpki.POW.Asymmetric
+        object, or None if the pool has nothing suitable.
+        """
+
+        import rpki.rpkidb.models
+        if keylength != self.keylength:
+            return None
+        try:
+            entry = rpki.rpkidb.models.KeyPoolEntry.objects.filter(keylength = keylength).order_by("pk")[:1].get()
+        except rpki.rpkidb.models.KeyPoolEntry.DoesNotExist:
+            logger.debug("RSA key pool empty, generating key synchronously")
+            self.misses += 1
+            self.depth = 0
+            self.refill()
+            return None
+        entry.delete()
+        if self.depth is not None:
+            self.depth -= 1
+        try:
+            key = rpki.POW.Asymmetric.pemReadPrivate(str(entry.private_key_pem), self.passphrase)
+        except rpki.POW.Error:
+            logger.warning("Couldn't decrypt pooled RSA key (passphrase changed?), flushing key pool")
+            rpki.rpkidb.models.KeyPoolEntry.objects.all().delete()
+            self.depth = 0
+            key = None
+        if key is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.refill()
+        return key
+
+    def status(self):
+        """
+        Pool metrics, for the status handler.
+        """
+
+        return dict(depth     = len(self),
+                    target    = self.target,
+                    pending   = self.pending,
+                    hits      = self.hits,
+                    misses    = self.misses,
+                    generated = self.generated)
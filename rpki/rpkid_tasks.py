@@ -82,6 +82,7 @@ class AbstractTask(object):
         self.done_this   = None
         self.done_next   = None
         self.due_date    = None
+        self.queued      = None
         self.started     = False
         self.postponed   = False
         self.clear()
@@ -132,7 +133,7 @@ class AbstractTask(object):
     def overdue(self):
         yield tornado.gen.moment
         raise tornado.gen.Return(rpki.sundial.now() > self.due_date and
-                                 any(not task.postponed for task in self.rpkid.task_ready))
+                                 self.rpkid.task_blocked(self))
 
     @tornado.gen.coroutine
     def main(self):
@@ -311,7 +312,7 @@ class UpdateChildrenTask(AbstractTask):
                     logger.debug("Resources shrank to null set, revoking and withdrawing child %s g(SKI) %s",
                                  child_handle, child_cert.gski)
                     child_cert.revoke(publisher = publisher)
-                    ca_detail.generate_crl_and_manifest(publisher = publisher)
+                    publisher.mark_dirty(ca_detail)
 
                 elif (old_resources != new_resources or old_aia != new_aia or
                       (old_resources.valid_until < rsn and
@@ -338,7 +339,7 @@ class UpdateChildrenTask(AbstractTask):
                     publisher.queue(uri = child_cert.uri,
                                     old_obj = child_cert.cert,
                                     repository = ca_detail.ca.parent.repository)
-                    ca_detail.generate_crl_and_manifest(publisher = publisher)
+                    publisher.mark_dirty(ca_detail)
 
             except:
                 logger.exception("%r: Couldn't update %r, skipping", self, child_cert)
@@ -447,8 +448,8 @@ class UpdateROAsTask(AbstractTask):
 
         if not publisher.empty():
             for ca_detail in rpki.rpkidb.models.CADetail.objects.filter(pk__in = ca_details):
-                logger.debug("%r: Generating new CRL and manifest for %r", self, ca_detail)
-                ca_detail.generate_crl_and_manifest(publisher = publisher)
+                logger.debug("%r: Need new CRL and manifest for %r", self, ca_detail)
+                publisher.mark_dirty(ca_detail)
             yield publisher.call_pubd()
 
         if postponing:
@@ -515,7 +516,7 @@ class UpdateGhostbustersTask(AbstractTask):
                 ghostbuster.revoke(publisher = publisher)
 
             for ca_detail in ca_details:
-                ca_detail.generate_crl_and_manifest(publisher = publisher)
+                publisher.mark_dirty(ca_detail)
 
             yield publisher.call_pubd()
 
@@ -609,7 +610,7 @@ class UpdateEECertificatesTask(AbstractTask):
                     ee.revoke(publisher = publisher)
 
             for ca_detail in ca_details:
-                ca_detail.generate_crl_and_manifest(publisher = publisher)
+                publisher.mark_dirty(ca_detail)
 
             yield publisher.call_pubd()
 
@@ -649,7 +650,7 @@ class RegenerateCRLsAndManifestsTask(AbstractTask):
                                                next_crl_manifest_update__lt = now + max(
                                                    rpki.sundial.timedelta(seconds = self.tenant.crl_interval) / 4,
                                                    rpki.sundial.timedelta(seconds = self.rpkid.cron_period  ) * 2)):
-                ca_detail.generate_crl_and_manifest(publisher = publisher)
+                publisher.mark_dirty(ca_detail)
 
             yield publisher.call_pubd()
 
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import rpki.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpkidb', '0002_root'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeyPoolEntry',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('keylength', models.PositiveIntegerField()),
+                ('private_key_pem', models.TextField()),
+                ('created', rpki.fields.SundialField()),
+            ],
+        ),
+    ]
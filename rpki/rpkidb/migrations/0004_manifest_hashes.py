@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+import rpki.x509
+
+
+def fill_manifest_hashes(apps, schema_editor):
+    for model_name, field_name in (("ChildCert",     "cert"),
+                                   ("EECertificate", "cert"),
+                                   ("Ghostbuster",   "ghostbuster"),
+                                   ("ROA",           "roa")):
+        for obj in apps.get_model("rpkidb", model_name).objects.all():
+            published = getattr(obj, field_name)
+            if published is not None:
+                obj.manifest_hash = rpki.x509.sha256(published.get_DER()).encode("hex")
+            if model_name in ("Ghostbuster", "ROA") and obj.cert is not None:
+                obj.gski = obj.cert.gSKI()
+            obj.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpkidb', '0003_keypoolentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='childcert',
+            name='manifest_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='eecertificate',
+            name='manifest_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='ghostbuster',
+            name='manifest_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='ghostbuster',
+            name='gski',
+            field=models.CharField(max_length=27, null=True),
+        ),
+        migrations.AddField(
+            model_name='roa',
+            name='manifest_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='roa',
+            name='gski',
+            field=models.CharField(max_length=27, null=True),
+        ),
+        migrations.RunPython(fill_manifest_hashes, migrations.RunPython.noop),
+    ]
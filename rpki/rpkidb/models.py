@@ -32,6 +32,7 @@ from django.db import models
 
 import rpki.left_right
 import rpki.sundial
+import rpki.signer
 
 from rpki.fields import (EnumField, SundialField,
                          CertificateField, RSAPrivateKeyField,
@@ -525,11 +526,12 @@ class Repository(models.Model):
             handlers = {}
         for q_pdu in q_msg:
             logger.info("Sending %r hash = %s uri = %s to pubd", q_pdu, q_pdu.get("hash"), q_pdu.get("uri"))
+        q_der = yield rpki.signer.run(rpki.publication.cms_msg().wrap, q_msg, self.bsc.private_key_id,
+                                      self.bsc.signing_cert, self.bsc.signing_cert_crl)
         http_request = tornado.httpclient.HTTPRequest(
             url             = self.peer_contact_uri,
             method          = "POST",
-            body            = rpki.publication.cms_msg().wrap(q_msg, self.bsc.private_key_id,
-                                                              self.bsc.signing_cert, self.bsc.signing_cert_crl),
+            body            = q_der,
             headers         = { "Content-Type" : rpki.publication.content_type },
             connect_timeout = rpkid.http_client_timeout,
             request_timeout = rpkid.http_client_timeout)
@@ -771,12 +773,12 @@ class Parent(models.Model):
         elif self.bsc.signing_cert is None:
             raise rpki.exceptions.BSCNotReady("%r is not yet usable" % self.bsc)
         else:
+            q_der = yield rpki.signer.run(rpki.up_down.cms_msg().wrap, q_msg, self.bsc.private_key_id,
+                                          self.bsc.signing_cert, self.bsc.signing_cert_crl)
             http_request = tornado.httpclient.HTTPRequest(
                 url             = self.peer_contact_uri,
                 method          = "POST",
-                body            = rpki.up_down.cms_msg().wrap(q_msg, self.bsc.private_key_id,
-                                                              self.bsc.signing_cert,
-                                                              self.bsc.signing_cert_crl),
+                body            = q_der,
                 headers         = { "Content-Type" : rpki.up_down.content_type },
                 connect_timeout = rpkid.http_client_timeout,
                 request_timeout = rpkid.http_client_timeout)
@@ -950,6 +952,13 @@ class Parent(models.Model):
 
 
 class CA(models.Model):
+
+    ## @var final_crl_attempts
+    # How many times revoke() tries to generate a ca_detail's final CRL
+    # and manifest when concurrent generations keep superseding it.
+
+    final_crl_attempts = 3
+
     last_crl_manifest_number = models.BigIntegerField(default = 1)
     last_issued_sn = models.BigIntegerField(default = 1)
     sia_uri = models.TextField(null = True)
@@ -1087,7 +1096,7 @@ class CA(models.Model):
         publisher = rpki.rpkid.publication_queue(rpkid = rpkid)
 
         if revoke_all:
-            ca_details = self.ca_details.all()
+            ca_details = self.ca_details.exclude(state = "revoked")
         else:
             ca_details = self.ca_details.filter(state = "deprecated")
 
@@ -1122,12 +1131,23 @@ class CA(models.Model):
                 eecert.revoke(publisher = publisher)
             nextUpdate += rpki.sundial.timedelta(seconds = self.parent.tenant.crl_interval)
 
-            ca_detail.generate_crl_and_manifest(publisher = publisher, nextUpdate = nextUpdate)
+            for attempt in xrange(self.final_crl_attempts):
+                generated = yield ca_detail.generate_crl_and_manifest(publisher = publisher, nextUpdate = nextUpdate)
+                if generated is not False:
+                    break
+                logger.debug("%r final CRL and manifest superseded, generating again", ca_detail)
+            if generated is None:
+                logger.debug("%r already revoked by someone else, skipping", ca_detail)
+                continue
+            if not generated:
+                logger.warning("%r final CRL and manifest superseded %d times, leaving revocation for next time",
+                               ca_detail, self.final_crl_attempts)
+                continue
             ca_detail.private_key_id = None
             ca_detail.manifest_private_key_id = None
             ca_detail.manifest_public_key = None
             ca_detail.state = "revoked"
-            ca_detail.save()
+            ca_detail.save(update_fields = ["private_key_id", "manifest_private_key_id", "manifest_public_key", "state"])
 
         yield publisher.call_pubd()
 
@@ -1145,6 +1165,15 @@ class CA(models.Model):
 
 
 class CADetail(models.Model):
+
+    ## @var crl_manifest_generation
+    # Most recent CRL/manifest number this process has allocated for
+    # each ca_detail, so generate_crl_and_manifest() can tell when it
+    # has been superseded.  CRL/manifest numbers are allocated per-CA,
+    # so we can't just compare with the CA's counter.
+
+    crl_manifest_generation = {}
+
     public_key = PublicKeyField(null = True)
     private_key_id = RSAPrivateKeyField(null = True)
     latest_crl = CRLField(null = True)
@@ -1228,7 +1257,7 @@ class CADetail(models.Model):
         self.latest_ca_cert = cert
         self.ca_cert_uri = uri
         self.state = "active"
-        self.generate_crl_and_manifest(publisher = publisher)
+        publisher.mark_dirty(self)
         self.save()
 
         if predecessor is not None:
@@ -1242,7 +1271,7 @@ class CADetail(models.Model):
                 ghostbuster.regenerate(publisher = publisher)
             for eecert in predecessor.ee_certificates.all():
                 eecert.reissue(publisher = publisher, ca_detail = self)
-            predecessor.generate_crl_and_manifest(publisher = publisher)
+            publisher.mark_dirty(predecessor)
 
         yield publisher.call_pubd()
 
@@ -1309,7 +1338,7 @@ class CADetail(models.Model):
         if self.latest_ca_cert != cert:
             self.latest_ca_cert = cert
             self.save()
-            self.generate_crl_and_manifest(publisher = publisher)
+            publisher.mark_dirty(self)
 
         new_resources = self.latest_ca_cert.get_3779resources()
 
@@ -1392,23 +1421,46 @@ class CADetail(models.Model):
             new_obj    = child_cert.cert,
             repository = ca.parent.repository,
             handler    = child_cert.published_callback)
-        self.generate_crl_and_manifest(publisher = publisher)
+        publisher.mark_dirty(self)
         return child_cert
 
 
+    @tornado.gen.coroutine
     def generate_crl_and_manifest(self, publisher, nextUpdate = None):
         """
         Generate a new CRL and a new manifest for this ca_detail.
 
         At the moment this is unconditional, that is, it is up to the
-        caller to decide whether a new CRL is needed.
+        caller to decide whether a new CRL is needed.  Most callers
+        shouldn't call this directly, they should use
+        publisher.mark_dirty() so that a batch of changes produces one
+        CRL and manifest rather than one per change.
 
         We used to handle CRL and manifest as two separate operations,
         but there's no real point, and it's simpler to do them at once.
+
+        The CRL and manifest signatures run in the rpki.signer pool.
+        If another generation for this ca_detail starts while we're
+        waiting for signatures, it saw a later view of the database and
+        took a later manifest number, so we discard our results.  The
+        returned future yields True if we installed a new CRL and
+        manifest, False if we were superseded, so callers which need
+        this particular CRL, such as CA.revoke(), can try again, or
+        None if the ca_detail has already been revoked, in which case
+        trying again won't help.
+
+        Other coroutines may change this ca_detail while we wait, so
+        we only write back the CRL and manifest fields.
         """
 
         trace_call_chain()
 
+        publisher.dirty.pop(self.pk, None)
+
+        if CADetail.objects.filter(pk = self.pk, state = "revoked").exists():
+            logger.debug("%r has been revoked, not generating CRL and manifest", self)
+            raise tornado.gen.Return(None)
+
         self.check_failed_publication(publisher)
 
         crl_interval = rpki.sundial.timedelta(seconds = self.ca.parent.tenant.crl_interval)
@@ -1422,6 +1474,7 @@ class CADetail(models.Model):
         manifest_uri = self.manifest_uri
 
         crl_manifest_number = self.ca.next_crl_manifest_number()
+        self.crl_manifest_generation[self.pk] = crl_manifest_number
 
         manifest_cert = self.issue_ee(
             ca          = self.ca,
@@ -1438,7 +1491,12 @@ class CADetail(models.Model):
                 certlist.append((revoked_cert.serial, revoked_cert.revoked))
         certlist.sort()
 
-        self.latest_crl = rpki.x509.CRL.generate(
+        names_and_hashes = list(self.manifest_entries())
+
+        logger.debug("%r Generating manifest, %d objects", self, len(names_and_hashes))
+
+        latest_crl = yield rpki.signer.run(
+            rpki.x509.CRL.generate,
             keypair             = self.private_key_id,
             issuer              = self.latest_ca_cert,
             serial              = crl_manifest_number,
@@ -1446,30 +1504,27 @@ class CADetail(models.Model):
             nextUpdate          = nextUpdate,
             revokedCertificates = certlist)
 
-        # XXX
-        logger.debug("%r Generating manifest, child_certs_all(): %r", self, self.child_certs.all())
-
-        objs = [(self.crl_uri_tail, self.latest_crl)]
-        objs.extend((c.uri_tail, c.cert)        for c in self.child_certs.all())
-        objs.extend((r.uri_tail, r.roa)         for r in self.roas.filter(roa__isnull = False))
-        objs.extend((g.uri_tail, g.ghostbuster) for g in self.ghostbusters.all())
-        objs.extend((e.uri_tail, e.cert)        for e in self.ee_certificates.all())
-
-        # XXX
-        logger.debug("%r Generating manifest, objs: %r", self, objs)
-
-        self.latest_manifest = rpki.x509.SignedManifest.build(
-            serial         = crl_manifest_number,
-            thisUpdate     = now,
-            nextUpdate     = nextUpdate,
-            names_and_objs = objs,
-            keypair        = self.manifest_private_key_id,
-            certs          = manifest_cert)
-
+        latest_manifest = yield rpki.signer.run(
+            rpki.x509.SignedManifest.build,
+            serial           = crl_manifest_number,
+            thisUpdate       = now,
+            nextUpdate       = nextUpdate,
+            names_and_objs   = ((self.crl_uri_tail, latest_crl),),
+            names_and_hashes = names_and_hashes,
+            keypair          = self.manifest_private_key_id,
+            certs            = manifest_cert)
+
+        if self.crl_manifest_generation.get(self.pk) != crl_manifest_number:
+            logger.debug("%r CRL and manifest #%s superseded while signing, discarding", self, crl_manifest_number)
+            raise tornado.gen.Return(False)
+
+        self.latest_crl         = latest_crl
+        self.latest_manifest    = latest_manifest
         self.crl_published      = now
         self.manifest_published = now
         self.next_crl_manifest_update = nextUpdate
-        self.save()
+        self.save(update_fields = ["latest_crl", "latest_manifest", "crl_published",
+                                   "manifest_published", "next_crl_manifest_update"])
 
         publisher.queue(
             uri        = crl_uri,
@@ -1485,6 +1540,37 @@ class CADetail(models.Model):
             repository = self.ca.parent.repository,
             handler    = self.manifest_published_callback)
 
+        raise tornado.gen.Return(True)
+
+
+    def manifest_entries(self):
+        """
+        Generate (filename, SHA-256 digest) pairs for the objects this
+        ca_detail lists on its manifest, other than its CRL.  Digests
+        come from the hashes stored when the objects were saved, which
+        migration 0004 fills in for older rows.  Should we find a row
+        without one anyway, we hash the object in memory rather than
+        writing to the database in the middle of building a manifest.
+
+        This is still one pass over every row under the ca_detail per
+        manifest, but only over two short columns.
+        """
+
+        trace_call_chain()
+        for queryset, suffix in ((self.child_certs.all(),                 ".cer"),
+                                 (self.roas.filter(roa__isnull = False),  ".roa"),
+                                 (self.ghostbusters.all(),                ".gbr"),
+                                 (self.ee_certificates.all(),             ".cer")):
+            missing = []
+            for pk, gski, manifest_hash in queryset.values_list("pk", "gski", "manifest_hash").iterator():
+                if gski is None or manifest_hash is None:
+                    missing.append(pk)
+                else:
+                    yield gski + suffix, manifest_hash.decode("hex")
+            for obj in queryset.filter(pk__in = missing):
+                logger.warning("%r has no stored manifest hash, hashing it now", obj)
+                yield obj.uri_tail, rpki.x509.sha256(getattr(obj, obj.manifest_field).get_DER())
+
 
     def crl_published_callback(self, pdu):
         """
@@ -1494,7 +1580,7 @@ class CADetail(models.Model):
         trace_call_chain()
         rpki.publication.raise_if_error(pdu)
         self.crl_published = None
-        self.save()
+        self.save(update_fields = ["crl_published"])
 
     def manifest_published_callback(self, pdu):
         """
@@ -1504,7 +1590,7 @@ class CADetail(models.Model):
         trace_call_chain()
         rpki.publication.raise_if_error(pdu)
         self.manifest_published = None
-        self.save()
+        self.save(update_fields = ["manifest_published"])
 
 
     @tornado.gen.coroutine
@@ -1524,7 +1610,7 @@ class CADetail(models.Model):
             ee_certificate.reissue(publisher, force = True)
         for child_cert in self.child_certs.all():
             child_cert.reissue(self, publisher, force = True)
-        self.generate_crl_and_manifest(publisher = publisher)
+        publisher.mark_dirty(self)
         self.save()
         yield publisher.call_pubd()
 
@@ -1638,7 +1724,7 @@ class Child(models.Model):
             ca_details.add(child_cert.ca_detail)
             child_cert.revoke(publisher = publisher)
         for ca_detail in ca_details:
-            ca_detail.generate_crl_and_manifest(publisher = publisher)
+            publisher.mark_dirty(ca_detail)
         yield publisher.call_pubd()
 
 
@@ -1777,7 +1863,7 @@ class Child(models.Model):
             ca_details.add(child_cert.ca_detail)
             child_cert.revoke(publisher = publisher)
         for ca_detail in ca_details:
-            ca_detail.generate_crl_and_manifest(publisher = publisher)
+            publisher.mark_dirty(ca_detail)
         yield publisher.call_pubd()
         SubElement(r_msg, key.tag, class_name = class_name, ski = key.get("ski"))
 
@@ -1814,16 +1900,43 @@ class Child(models.Model):
             logger.exception("Unhandled exception serving child %r", self)
             rpki.up_down.generate_error_response_from_exception(r_msg, e, q_type)
 
-        r_der = rpki.up_down.cms_msg().wrap(r_msg, self.bsc.private_key_id, self.bsc.signing_cert, self.bsc.signing_cert_crl)
+        r_der = yield rpki.signer.run(rpki.up_down.cms_msg().wrap, r_msg, self.bsc.private_key_id,
+                                      self.bsc.signing_cert, self.bsc.signing_cert_crl)
         raise tornado.gen.Return(r_der)
 
-class ChildCert(models.Model):
+class ManifestedObject(models.Model):
+    """
+    Abstract base for objects a CADetail lists on its manifest.  We
+    record the hash of the published object whenever we save it, so
+    that building a manifest is a query for names and hashes rather
+    than fetching, parsing, and hashing every object under the
+    CADetail.  manifest_field names the field holding the published
+    object; gski, which subclasses define, gives its filename.
+    """
+
+    manifest_hash = models.CharField(max_length = 64, null = True)
+
+    manifest_field = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # pylint: disable=E1101
+        obj = getattr(self, self.manifest_field)
+        self.manifest_hash = None if obj is None else rpki.x509.sha256(obj.get_DER()).encode("hex")
+        super(ManifestedObject, self).save(*args, **kwargs)
+
+
+class ChildCert(ManifestedObject):
     cert = CertificateField()
     published = SundialField(null = True)
     gski = models.CharField(max_length = 27)      # Assumes SHA-1 -- SHA-256 would be 43, SHA-512 would be 86, etc.
     child = models.ForeignKey(Child, related_name = "child_certs")
     ca_detail = models.ForeignKey(CADetail, related_name = "child_certs")
 
+    manifest_field = "cert"
+
     def __repr__(self):
         try:
             return "<ChildCert: {}.{} {}>".format(self.child.tenant.tenant_handle,
@@ -1921,7 +2034,7 @@ class ChildCert(models.Model):
             for child_cert in child.child_certs.filter(ca_detail = ca_detail, gski = self.gski):
                 logger.debug("Revoking %r", child_cert)
                 child_cert.revoke(publisher = publisher)
-            ca_detail.generate_crl_and_manifest(publisher = publisher)
+            publisher.mark_dirty(ca_detail)
         child_cert = ca_detail.issue(
             ca          = ca,
             child       = child,
@@ -1945,13 +2058,15 @@ class ChildCert(models.Model):
         self.save()
 
 
-class EECertificate(models.Model):
+class EECertificate(ManifestedObject):
     gski = models.CharField(max_length = 27)      # Assumes SHA-1 -- SHA-256 would be 43, SHA-512 would be 86, etc.
     cert = CertificateField()
     published = SundialField(null = True)
     tenant = models.ForeignKey(Tenant, related_name = "ee_certificates")
     ca_detail = models.ForeignKey(CADetail, related_name = "ee_certificates")
 
+    manifest_field = "cert"
+
     def __repr__(self):
         try:
             return "<EECertificate: {} {}>".format(self.tenant.tenant_handle,
@@ -2054,7 +2169,7 @@ class EECertificate(models.Model):
             handler    = self.published_callback)
         if must_revoke:
             RevokedCert.revoke(cert = old_cert.cert, ca_detail = old_ca_detail)
-        ca_detail.generate_crl_and_manifest(publisher = publisher)
+        publisher.mark_dirty(ca_detail)
 
 
     def published_callback(self, pdu):
@@ -2069,14 +2184,21 @@ class EECertificate(models.Model):
 
 
 
-class Ghostbuster(models.Model):
+class Ghostbuster(ManifestedObject):
     vcard = models.TextField()
     cert = CertificateField()
     ghostbuster = GhostbusterField()
     published = SundialField(null = True)
+    gski = models.CharField(max_length = 27, null = True)
     tenant = models.ForeignKey(Tenant, related_name = "ghostbusters")
     ca_detail = models.ForeignKey(CADetail, related_name = "ghostbusters")
 
+    manifest_field = "ghostbuster"
+
+    def save(self, *args, **kwargs):
+        self.gski = None if self.cert is None else self.cert.gSKI()
+        super(Ghostbuster, self).save(*args, **kwargs)
+
     def __repr__(self):
         try:
             uri = " " + self.uri
@@ -2257,16 +2379,23 @@ class RevokedCert(models.Model):
             ca_detail = ca_detail)
 
 
-class ROA(models.Model):
+class ROA(ManifestedObject):
     asn = models.BigIntegerField()
     ipv4 = models.TextField(null = True)
     ipv6 = models.TextField(null = True)
     cert = CertificateField()
     roa = ROAField()
     published = SundialField(null = True)
+    gski = models.CharField(max_length = 27, null = True)
     tenant = models.ForeignKey(Tenant, related_name = "roas")
     ca_detail = models.ForeignKey(CADetail, related_name = "roas")
 
+    manifest_field = "roa"
+
+    def save(self, *args, **kwargs):
+        self.gski = None if self.cert is None else self.cert.gSKI()
+        super(ROA, self).save(*args, **kwargs)
+
     def __repr__(self):
         try:
             resources = " {} {}".format(self.asn, ",".join(str(ip) for ip in (self.ipv4, self.ipv6) if ip is not None))
@@ -2479,3 +2608,16 @@ class ROA(models.Model):
         """
 
         return self.cert.gSKI() + ".roa"
+
+
+class KeyPoolEntry(models.Model):
+    """
+    A pre-generated RSA keypair waiting to be handed out by
+    rpki.rpkid_keypool.KeyPool.  The key is stored as passphrase-encrypted
+    PEM, so that the pool isn't a stash of usable private keys for
+    anybody who can read the database.
+    """
+
+    keylength = models.PositiveIntegerField()
+    private_key_pem = models.TextField()
+    created = SundialField()
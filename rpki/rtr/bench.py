@@ -0,0 +1,293 @@
+# $Id$
+#
+# Copyright (C) 2014  Dragon Research Labs ("DRL")
+#
+# Permission to use, copy, modify, and distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notices and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DRL DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS.  IN NO EVENT SHALL DRL BE LIABLE FOR ANY
+# SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Load generator and latency benchmark for the RPKI-RTR server.
+"""
+
+import os
+import sys
+import time
+import struct
+import asyncore
+import logging
+import subprocess
+import rpki.rtr.pdus
+import rpki.rtr.client
+import rpki.rtr.channels
+import rpki.rtr.server
+import rpki.rtr.generator
+
+from rpki.rtr.pdus     import ResetQueryPDU, SerialQueryPDU
+from rpki.rtr.channels import Timestamp
+
+
+class BenchChannel(rpki.rtr.client.ClientChannel):
+    """
+    Client protocol engine for one simulated router session.  Runs a
+    fixed number of queries, alternating reset and serial queries, and
+    records how long each one took to reach End Of Data.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.queries = 0
+        self.pdus = 0
+        self.latencies = dict(reset = [], serial = [])
+        self.pending = None
+        self.started = None
+        self.failed = False
+        self.finished = False
+        super(BenchChannel, self).__init__(*args, **kwargs)
+
+    def next_query(self):
+        """
+        Send our next query, or note that we're done.
+        """
+
+        if self.queries >= self.args.queries:
+            self.finished = True
+            return
+        self.queries += 1
+        self.started = time.time()
+        if self.serial is None or self.queries % 2 == 1:
+            self.pending = "reset"
+            self.push_pdu(ResetQueryPDU(version = self.version))
+        else:
+            self.pending = "serial"
+            self.push_pdu(SerialQueryPDU(version = self.version,
+                                         serial  = self.serial if self.args.serial_from is None else self.args.serial_from,
+                                         nonce   = self.nonce))
+
+    def query_done(self):
+        """
+        Record latency of the query in progress, then start another.
+        """
+
+        self.latencies[self.pending].append(time.time() - self.started)
+        self.pending = None
+        self.next_query()
+
+    def deliver_pdu(self, pdu):
+        """
+        Count PDUs and watch for the end of each response.  Data PDUs
+        are just counted, and notifies are ignored, so that what we're
+        measuring is the server rather than our own bookkeeping.
+        """
+
+        self.pdus += 1
+        if isinstance(pdu, rpki.rtr.pdus.EndOfDataPDUv0):
+            pdu.consume(self)
+            self.query_done()
+        elif isinstance(pdu, rpki.rtr.pdus.CacheResetPDU):
+            self.cache_reset()
+            self.query_done()
+        elif isinstance(pdu, rpki.rtr.pdus.ErrorReportPDU):
+            logging.warning("[Session %s got error %s]", self.queries, pdu)
+            self.failed = True
+            self.finished = True
+        elif isinstance(pdu, rpki.rtr.pdus.CacheResponsePDU):
+            pdu.consume(self)
+
+    def push_pdu(self, pdu):
+        """
+        Write PDU to stream without logging it.
+        """
+
+        rpki.rtr.channels.PDUChannel.push_pdu(self, pdu)
+
+    def handle_close(self):
+        """
+        Server hung up on us: record failure rather than exiting.
+        """
+
+        if not self.finished:
+            logging.warning("[Server closed session after %d queries]", self.queries)
+            self.failed = True
+            self.finished = True
+        self.close()
+
+    def handle_error(self):
+        """
+        Record failure of this session without taking down the others.
+        """
+
+        logging.exception("[Unhandled exception in session]")
+        self.failed = self.finished = True
+        self.close()
+
+
+def generate_data(version, prefixes, changes):
+    """
+    Generate a synthetic database in the current directory: an AXFR of
+    the requested size, an older AXFR differing from it by the
+    requested number of prefixes, and the IXFR between them.  Returns
+    the older serial number, for use in serial queries.
+    """
+
+    def vrp(i):
+        return rpki.rtr.generator.PrefixPDU.wire_from_vrp(
+            version, 64512 + i % 1000, struct.pack("!L", ((10 << 24) + (i << 8)) & 0xFFFFFFFF), 24, 24)
+
+    new = rpki.rtr.generator.AXFRSet(version = version)
+    new.serial = Timestamp.now()
+    new.extend(vrp(i) for i in xrange(prefixes))
+    new.sort_and_dedup()
+
+    old = rpki.rtr.generator.AXFRSet(version = version)
+    old.serial = Timestamp(new.serial - 1)
+    old.extend(vrp(i) for i in xrange(changes, prefixes + changes))
+    old.sort_and_dedup()
+
+    old.save_axfr()
+    new.save_axfr()
+    new.save_ixfr(old)
+    rpki.rtr.server.write_current(new.serial, rpki.rtr.generator.AXFRSet.new_nonce(False), version)
+    logging.info("[Generated %d prefix AXFR %s and %d PDU IXFR from %s]",
+                 len(new), new.filename(), len(new.ixfr(old)), old.serial)
+    return old.serial
+
+
+def process_rss(pids):
+    """
+    Return total resident set size in kilobytes of the given processes
+    and all their descendants, or None if we can't find out.  Uses ps
+    rather than /proc so that this works on BSD as well as Linux.
+    """
+
+    try:
+        output = subprocess.check_output(("ps", "-A", "-o", "pid=,ppid=,rss="))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    children = {}
+    rss = {}
+    for line in output.splitlines():
+        pid, ppid, kb = (int(f) for f in line.split())
+        children.setdefault(ppid, []).append(pid)
+        rss[pid] = kb
+    total = 0
+    pids = list(pids)
+    while pids:
+        pid = pids.pop()
+        total += rss.get(pid, 0)
+        pids.extend(children.get(pid, ()))
+    return total
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def bench_main(args):
+    """
+    Load generator and latency benchmark for the rpki-rtr server.
+    Opens a number of concurrent simulated router sessions, each of
+    which runs a series of alternating reset and serial queries, then
+    reports response latency, PDU throughput, and server memory use.
+    Optionally generates a synthetic database of a given size first.
+    Sessions still running after --timeout seconds count as failed.
+    """
+
+    if args.rpki_rtr_dir:
+        try:
+            if not os.path.isdir(args.rpki_rtr_dir):
+                os.makedirs(args.rpki_rtr_dir)
+            os.chdir(args.rpki_rtr_dir)
+        except OSError, e:
+            sys.exit(e)
+
+    version = max(rpki.rtr.pdus.PDU.version_map) if args.force_version is None else args.force_version
+
+    if args.generate:
+        serial_from = generate_data(version, args.generate, args.changes)
+        if args.serial_from is None:
+            args.serial_from = serial_from
+
+    constructor = getattr(BenchChannel, args.protocol)
+    sessions = []
+    started = time.time()
+    try:
+        for i in xrange(args.sessions):
+            session = constructor(args)
+            if session.version is None:
+                session.version = version
+            sessions.append(session)
+        connected = time.time()
+        for session in sessions:
+            session.next_query()
+        deadline = connected + args.timeout
+        while not all(session.finished for session in sessions):
+            if time.time() > deadline:
+                stalled = [session for session in sessions if not session.finished]
+                logging.warning("[Timed out after %ds with %d sessions unfinished]", args.timeout, len(stalled))
+                for session in stalled:
+                    session.failed = session.finished = True
+                break
+            asyncore.loop(timeout = 1, count = 1, use_poll = True)
+        finished = time.time()
+
+        pids = [session.proc.pid for session in sessions if session.proc is not None]
+        if args.server_pid is not None:
+            pids.append(args.server_pid)
+        rss = process_rss(pids) if pids else None
+
+    finally:
+        for session in sessions:
+            session.cleanup()
+
+    pdus = sum(session.pdus for session in sessions)
+    elapsed = finished - connected
+    sys.stdout.write("Sessions:      %d (%d failed), connected in %.3fs\n" % (
+        len(sessions), sum(session.failed for session in sessions), connected - started))
+    for kind in ("reset", "serial"):
+        latencies = sorted(l for session in sessions for l in session.latencies[kind])
+        sys.stdout.write("%-14s %d queries, p50 %.3fms, p99 %.3fms\n" % (
+            kind.capitalize() + ":", len(latencies),
+            percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000))
+    sys.stdout.write("PDUs:          %d in %.3fs, %.0f PDUs/s\n" % (pdus, elapsed, pdus / elapsed if elapsed > 0 else 0))
+    sys.stdout.write("Server RSS:    %s\n" % ("unknown" if rss is None else "%d KB" % rss))
+
+
+def argparse_setup(subparsers):
+    """
+    Set up argparse stuff for commands in this module.
+    """
+
+    subparser = subparsers.add_parser("bench", description = bench_main.__doc__,
+                                      help = "Load generator and latency benchmark for RPKI-RTR server")
+    subparser.set_defaults(func = bench_main, default_log_destination = "stderr",
+                           sql_database = None, reset_session = False, sql_shadow_reset = False)
+    subparser.add_argument("--sessions", type = int, default = 100, help = "number of concurrent router sessions")
+    subparser.add_argument("--queries", type = int, default = 10, help = "number of queries per session")
+    subparser.add_argument("--timeout", type = int, default = 300,
+                           help = "give up on sessions still running after this many seconds")
+    subparser.add_argument("--generate", type = int, metavar = "PREFIXES",
+                           help = "generate a synthetic database with this many prefixes first")
+    subparser.add_argument("--changes", type = int, default = 1000,
+                           help = "number of prefixes by which generated AXFRs differ")
+    subparser.add_argument("--serial-from", type = int, help = "serial number to use in serial queries")
+    subparser.add_argument("--server-pid", type = int, help = "process ID of server, for memory use report")
+    subparser.add_argument("--force-version", type = int, choices = rpki.rtr.pdus.PDU.version_map,
+                           help = "force specific protocol version")
+    subparser.add_argument("--rpki-rtr-dir", help = "directory containing (or to contain) RPKI-RTR database")
+    subparser.add_argument("protocol", choices = ("loopback", "tcp"), help = "connection protocol")
+    subparser.add_argument("host", nargs = "?", help = "server host")
+    subparser.add_argument("port", nargs = "?", help = "server port")
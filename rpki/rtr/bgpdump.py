@@ -113,14 +113,11 @@ class AXFRSet(rpki.rtr.generator.AXFRSet):
                 pfx = PrefixPDU.from_bgpdump(line, rib_dump = True)
             except IgnoreThisRecord:
                 continue
-            self.append(pfx)
+            self.append(pfx.to_pdu())
             self.serial = pfx.timestamp
         if self.serial is None:
             sys.exit("Failed to parse anything useful from %s" % filename)
-        self.sort()
-        for i in xrange(len(self) - 2, -1, -1):
-            if self[i] == self[i + 1]:
-                del self[i + 1]
+        self.sort_and_dedup()
         return self
 
     def parse_bgpdump_update(self, filename):
@@ -130,14 +127,15 @@ class AXFRSet(rpki.rtr.generator.AXFRSet):
                 pfx = PrefixPDU.from_bgpdump(line, rib_dump = False)
             except IgnoreThisRecord:
                 continue
-            announce = pfx.announce
-            pfx.announce = 1
-            i = bisect.bisect_left(self, pfx)
-            if announce:
-                if i >= len(self) or pfx != self[i]:
-                    self.insert(i, pfx)
+            # BGP dumps always have max_prefixlen == prefixlen, so PDUs
+            # for the same prefix differ only in the trailing ASN.
+            pdu = pfx.to_pdu(announce = 1)
+            i = bisect.bisect_left(self, pdu)
+            if pfx.announce:
+                if i >= len(self) or pdu != self[i]:
+                    self.insert(i, pdu)
             else:
-                while i < len(self) and pfx.prefix == self[i].prefix and pfx.prefixlen == self[i].prefixlen:
+                while i < len(self) and pdu[:-4] == self[i][:-4]:
                     del self[i]
             self.serial = pfx.timestamp
 
@@ -219,7 +217,7 @@ def bgpdump_select_main(args):
         nonce = rpki.rtr.generator.AXFRSet.new_nonce(force_zero_nonce = False)
 
     rpki.rtr.server.write_current(serial, nonce, version)
-    rpki.rtr.generator.kick_all(serial)
+    rpki.rtr.generator.kick_all(serial, nonce, version)
 
 
 class BGPDumpReplayClock(object):
@@ -53,12 +53,21 @@ class ReadBuffer(object):
     """
     Wrapper around synchronous/asynchronous read state.
 
+    Data accumulates in a bytearray and is consumed by advancing an
+    offset, so reading a large transfer doesn't copy the whole buffer
+    once per PDU; consumed data is discarded in bulk when we add more.
+
     This also handles tracking the current protocol version,
     because it has to go somewhere and there's no better place.
     """
 
+    # Don't bother compacting the buffer until at least this much of it
+    # has been consumed.
+    compact_threshold = 65536
+
     def __init__(self):
-        self.buffer = ""
+        self.buffer = bytearray()
+        self.offset = 0
         self.version = None
         self.need = None
         self.callback = None
@@ -84,7 +93,7 @@ class ReadBuffer(object):
         How much data do we have available in this buffer?
         """
 
-        return len(self.buffer)
+        return len(self.buffer) - self.offset
 
     def needed(self):
         """
@@ -105,16 +114,38 @@ class ReadBuffer(object):
         Hand some data to the caller.
         """
 
-        b = self.buffer[:n]
-        self.buffer = self.buffer[n:]
+        b = str(buffer(self.buffer, self.offset, n))
+        self.offset += len(b)
         return b
 
+    def skip(self, n):
+        """
+        Discard some data the caller has already decoded in place.
+        """
+
+        assert n <= self.available()
+        self.offset += n
+
+    def unpack(self, s):
+        """
+        Unpack a struct.Struct from the front of the buffer without
+        consuming anything.
+        """
+
+        return s.unpack_from(self.buffer, self.offset)
+
     def put(self, b):
         """
         Accumulate some data.
         """
 
-        self.buffer += b
+        if self.offset == len(self.buffer):
+            del self.buffer[:]
+            self.offset = 0
+        elif self.offset >= self.compact_threshold and self.offset * 2 >= len(self.buffer):
+            del self.buffer[:self.offset]
+            self.offset = 0
+        self.buffer.extend(b)
 
     def check_version(self, version):
         """
@@ -140,6 +171,10 @@ class PDUChannel(asynchat.async_chat, object):
     PDUs.
     """
 
+    # Subclasses which expect to receive large numbers of prefix PDUs
+    # (ie, clients) can set this to decode them in bulk.
+    bulk_prefixes = False
+
     def __init__(self, root_pdu_class, sock = None):
         asynchat.async_chat.__init__(self, sock)            # Old-style class, can't use super()
         self.reader = ReadBuffer()
@@ -160,23 +195,48 @@ class PDUChannel(asynchat.async_chat, object):
         """
 
         try:
-            p = self.root_pdu_class.read_pdu(self.reader)
-            while p is not None:
-                self.deliver_pdu(p)
+            while True:
+                if self.bulk_prefixes:
+                    self.deliver_prefix_run()
                 p = self.root_pdu_class.read_pdu(self.reader)
+                if p is None:
+                    break
+                self.deliver_pdu(p)
         except rpki.rtr.pdus.PDUException, e:
             self.push_pdu(e.make_error_report(version = self.version))
             self.close_when_done()
         else:
             assert not self.reader.ready()
-            self.set_terminator(self.reader.needed())
+            self.set_terminator(None if self.bulk_prefixes else self.reader.needed())
+
+    def deliver_prefix_run(self):
+        """
+        Decode and deliver any run of prefix PDUs at the front of the
+        read buffer in one go, rather than one at a time.
+        """
+
+        version, pdu_type, run, offset = rpki.rtr.pdus.decode_prefix_run(
+            self.reader.buffer, self.reader.offset, len(self.reader.buffer))
+        if run:
+            self.reader.check_version(version)
+            self.reader.skip(offset - self.reader.offset)
+            cls = self.root_pdu_class.version_map[version][pdu_type]
+            for fields in run:
+                self.deliver_pdu(cls.from_fields(version, *fields))
 
     def collect_incoming_data(self, data):
         """
-        Collect data into the read buffer.
+        Collect data into the read buffer.  In bulk mode we don't use
+        asynchat's terminators, we just take whatever arrives and decode
+        as much of it as we can.
         """
 
         self.reader.put(data)
+        if self.bulk_prefixes:
+            p = self.reader.retry()
+            if p is not None:
+                self.deliver_pdu(p)
+                self.start_new_pdu()
 
     def found_terminator(self):
         """
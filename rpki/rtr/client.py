@@ -181,7 +181,22 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
     expire   = rpki.rtr.pdus.default_expire
     updated  = Timestamp(0)
 
+    # Decode runs of prefix PDUs in bulk.
+    bulk_prefixes = True
+
+    # Set when we send a ResetQueryPDU, so we know the next End Of Data
+    # completes a full replacement of our table rather than an update.
+    resetting = False
+
+    # How many buffered rows we let pile up before pushing them into
+    # the shadow tables during a reset (--sql-shadow-reset only).
+    sql_batch_size = 10000
+
     def __init__(self, sock, proc, killsig, args, host = None, port = None):
+        self.prefix_adds = []
+        self.prefix_dels = []
+        self.routerkey_adds = []
+        self.routerkey_dels = []
         self.killsig = killsig
         self.proc = proc
         self.args = args
@@ -286,6 +301,8 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
         self.sql.text_factory = str
         cur = self.sql.cursor()
         cur.execute("PRAGMA foreign_keys = on")
+        cur.execute("PRAGMA journal_mode = WAL")
+        cur.execute("PRAGMA synchronous = NORMAL")
         if missing:
             cur.execute('''
                 CREATE TABLE cache (
@@ -324,6 +341,11 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
                         UNIQUE          (cache_id, asn, key))''')
         elif self.args.reset_session:
             cur.execute("DELETE FROM cache WHERE host = ? and port = ?", (self.host, self.port))
+        cur.execute("CREATE INDEX IF NOT EXISTS prefix_lookup ON prefix (cache_id, prefix, prefixlen)")
+        cur.execute("CREATE INDEX IF NOT EXISTS routerkey_lookup ON routerkey (cache_id, ski)")
+        if self.args.sql_shadow_reset:
+            cur.execute("CREATE TEMP TABLE prefix_shadow (asn, prefix, prefixlen, max_prefixlen)")
+            cur.execute("CREATE TEMP TABLE routerkey_shadow (asn, ski, key)")
         cur.execute("SELECT cache_id, version, nonce, serial, refresh, retry, expire, updated "
                     "FROM cache WHERE host = ? AND port = ?",
                     (self.host, self.port))
@@ -356,6 +378,7 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
         """
 
         self.serial = None
+        self.sql_discard()
         if self.sql:
             cur = self.sql.cursor()
             cur.execute("DELETE FROM prefix WHERE cache_id = ?", (self.cache_id,))
@@ -376,6 +399,7 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
         self.expire  = expire
         self.updated = Timestamp.now()
         if self.sql:
+            self.sql_apply()
             self.sql.execute("UPDATE cache SET"
                              " version = ?, serial = ?, nonce  = ?,"
                              " refresh = ?, retry  = ?, expire = ?,"
@@ -383,6 +407,76 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
                              "WHERE cache_id = ?",
                              (version, serial, nonce, refresh, retry, expire, int(self.updated), self.cache_id))
             self.sql.commit()
+        self.resetting = False
+
+    def sql_discard(self):
+        """
+        Throw away buffered changes.
+        """
+
+        del self.prefix_adds[:]
+        del self.prefix_dels[:]
+        del self.routerkey_adds[:]
+        del self.routerkey_dels[:]
+        if self.sql and self.args.sql_shadow_reset:
+            self.sql.execute("DELETE FROM prefix_shadow")
+            self.sql.execute("DELETE FROM routerkey_shadow")
+
+    def sql_shadow(self):
+        """
+        Move buffered announcements into the shadow tables.  These are
+        temporary tables without indexes, so this is cheap, and it keeps
+        a reset of a large table from having to buffer it all in memory.
+        """
+
+        self.sql.executemany("INSERT INTO prefix_shadow (asn, prefix, prefixlen, max_prefixlen) "
+                             "VALUES (?, ?, ?, ?)",
+                             self.prefix_adds)
+        self.sql.executemany("INSERT INTO routerkey_shadow (asn, ski, key) "
+                             "VALUES (?, ?, ?)",
+                             self.routerkey_adds)
+        del self.prefix_adds[:]
+        del self.routerkey_adds[:]
+
+    def sql_apply(self):
+        """
+        Apply everything we've buffered since the Cache Response.  Caller
+        commits, so the whole response lands in one transaction, which
+        (with WAL) readers never see half-applied.  If this response was
+        for a reset query, it replaces everything we had for this cache,
+        either from the buffer or by swapping in the shadow tables.
+        """
+
+        cur = self.sql.cursor()
+        if self.resetting:
+            cur.execute("DELETE FROM prefix WHERE cache_id = ?", (self.cache_id,))
+            cur.execute("DELETE FROM routerkey WHERE cache_id = ?", (self.cache_id,))
+            if self.args.sql_shadow_reset:
+                self.sql_shadow()
+                cur.execute("INSERT INTO prefix (cache_id, asn, prefix, prefixlen, max_prefixlen) "
+                            "SELECT ?, asn, prefix, prefixlen, max_prefixlen FROM prefix_shadow",
+                            (self.cache_id,))
+                cur.execute("INSERT INTO routerkey (cache_id, asn, ski, key) "
+                            "SELECT ?, asn, ski, key FROM routerkey_shadow",
+                            (self.cache_id,))
+                cur.execute("DELETE FROM prefix_shadow")
+                cur.execute("DELETE FROM routerkey_shadow")
+        cur.executemany("DELETE FROM prefix "
+                        "WHERE cache_id = ? AND asn = ? AND prefix = ? AND prefixlen = ? AND max_prefixlen = ?",
+                        ((self.cache_id,) + values for values in self.prefix_dels))
+        cur.executemany("DELETE FROM routerkey "
+                        "WHERE cache_id = ? AND asn = ? AND (ski = ? OR key = ?)",
+                        ((self.cache_id,) + values for values in self.routerkey_dels))
+        cur.executemany("INSERT INTO prefix (cache_id, asn, prefix, prefixlen, max_prefixlen) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        ((self.cache_id,) + values for values in self.prefix_adds))
+        cur.executemany("INSERT INTO routerkey (cache_id, asn, ski, key) "
+                        "VALUES (?, ?, ?, ?)",
+                        ((self.cache_id,) + values for values in self.routerkey_adds))
+        del self.prefix_adds[:]
+        del self.prefix_dels[:]
+        del self.routerkey_adds[:]
+        del self.routerkey_dels[:]
 
     def consume_prefix(self, prefix):
         """
@@ -390,15 +484,13 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
         """
 
         if self.sql:
-            values = (self.cache_id, prefix.asn, str(prefix.prefix), prefix.prefixlen, prefix.max_prefixlen)
+            values = (prefix.asn, str(prefix.prefix), prefix.prefixlen, prefix.max_prefixlen)
             if prefix.announce:
-                self.sql.execute("INSERT INTO prefix (cache_id, asn, prefix, prefixlen, max_prefixlen) "
-                                 "VALUES (?, ?, ?, ?, ?)",
-                                 values)
+                self.prefix_adds.append(values)
+                if self.resetting and self.args.sql_shadow_reset and len(self.prefix_adds) >= self.sql_batch_size:
+                    self.sql_shadow()
             else:
-                self.sql.execute("DELETE FROM prefix "
-                                 "WHERE cache_id = ? AND asn = ? AND prefix = ? AND prefixlen = ? AND max_prefixlen = ?",
-                                 values)
+                self.prefix_dels.append(values)
 
     def consume_routerkey(self, routerkey):
         """
@@ -406,17 +498,13 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
         """
 
         if self.sql:
-            values = (self.cache_id, routerkey.asn,
+            values = (routerkey.asn,
                       base64.urlsafe_b64encode(routerkey.ski).rstrip("="),
                       base64.b64encode(routerkey.key))
             if routerkey.announce:
-                self.sql.execute("INSERT INTO routerkey (cache_id, asn, ski, key) "
-                                 "VALUES (?, ?, ?, ?)",
-                                 values)
+                self.routerkey_adds.append(values)
             else:
-                self.sql.execute("DELETE FROM routerkey "
-                                 "WHERE cache_id = ? AND asn = ? AND (ski = ? OR key = ?)",
-                                 values)
+                self.routerkey_dels.append(values)
 
     def deliver_pdu(self, pdu):
         """
@@ -431,6 +519,9 @@ class ClientChannel(rpki.rtr.channels.PDUChannel):
         """
 
         logging.debug(pdu)
+        if isinstance(pdu, ResetQueryPDU):
+            self.resetting = True
+            self.sql_discard()
         super(ClientChannel, self).push_pdu(pdu)
 
     def cleanup(self):
@@ -526,6 +617,8 @@ def argparse_setup(subparsers):
     subparser.add_argument("--sql-database", help = "filename for sqlite3 database of client state")
     subparser.add_argument("--force-version", type = int, choices = PDU.version_map, help = "force specific protocol version")
     subparser.add_argument("--reset-session", action = "store_true", help = "reset any existing session found in sqlite3 database")
+    subparser.add_argument("--sql-shadow-reset", action = "store_true",
+                           help = "stage reset responses in shadow tables and swap them in at End Of Data")
     subparser.add_argument("protocol", choices = ("loopback", "tcp", "ssh", "tls"), help = "connection protocol")
     subparser.add_argument("host", nargs = "?", help = "server host")
     subparser.add_argument("port", nargs = "?", help = "server port")
@@ -24,16 +24,21 @@ Database generator for RPKI-RTR server (RFC 6810 et sequalia).
 import os
 import sys
 import glob
+import mmap
 import socket
 import base64
 import random
 import logging
+import cPickle
+import itertools
+import multiprocessing
 import subprocess
 import rpki.POW
 import rpki.oids
 import rpki.rtr.pdus
 import rpki.rtr.channels
 import rpki.rtr.server
+import rpki.rcynicdb.iterator
 
 from rpki.rtr.channels import Timestamp
 
@@ -86,6 +91,33 @@ class PrefixPDU(rpki.rtr.pdus.PrefixPDU):
         self.check()
         return self
 
+    @staticmethod
+    def wire_from_roa(version, asn, prefix_tuple):
+        """
+        Construct the wire format of a prefix from a ROA directly,
+        without going through a PDU object.
+        """
+
+        address, length, maxlength = prefix_tuple
+        return PrefixPDU.wire_from_vrp(version, asn, address.toBytes(), length,
+                                       length if maxlength is None else maxlength)
+
+    @staticmethod
+    def wire_from_vrp(version, asn, address, length, maxlength):
+        """
+        Construct the wire format of a prefix from an ASN, the packed
+        form of an address, and prefix lengths.  This is the hot path
+        when building a PDUSet, so we only do the range checks that the
+        ROA decoder hasn't already done for us.
+        """
+
+        cls = IPv6PrefixPDU if len(address) == 16 else IPv4PrefixPDU
+        if length < 0 or maxlength < length or maxlength > len(address) * 8:
+            raise rpki.rtr.pdus.CorruptData("Implausible prefix length %s-%s" % (length, maxlength))
+        return (cls.header_struct.pack(version, cls.pdu_type, cls.pdu_length, 1, length, maxlength) +
+                address +
+                cls.asnum_struct.pack(asn))
+
 
 class IPv4PrefixPDU(PrefixPDU):
     """
@@ -94,6 +126,7 @@ class IPv4PrefixPDU(PrefixPDU):
 
     pdu_type = 4
     address_byte_count = 4
+    pdu_length = PrefixPDU.header_struct.size + address_byte_count + PrefixPDU.asnum_struct.size
 
 class IPv6PrefixPDU(PrefixPDU):
     """
@@ -102,6 +135,7 @@ class IPv6PrefixPDU(PrefixPDU):
 
     pdu_type = 6
     address_byte_count = 16
+    pdu_length = PrefixPDU.header_struct.size + address_byte_count + PrefixPDU.asnum_struct.size
 
 class RouterKeyPDU(rpki.rtr.pdus.RouterKeyPDU):
     """
@@ -178,13 +212,155 @@ class X509(rpki.POW.X509):              # pylint: disable=W0232
                     yield asn
 
 
+def decode_objects(batch):
+    """
+    Decode a batch of (sha256, uri, der) tuples for VRPCache, returning
+    (kind, sha256, data) tuples made of nothing but strings and numbers
+    so that they pickle cheaply.  Runs in worker processes.
+    """
+
+    result = []
+    for sha256, uri, der in batch:
+        try:
+            if uri.endswith(".roa"):
+                roa = ROA.derRead(der)
+                roa.extractWithoutVerifying()
+                prefixes = tuple((address.toBytes(), length, length if maxlength is None else maxlength)
+                                 for address, length, maxlength in roa.prefixes)
+                result.append(("roa", sha256, (roa.getASID(), prefixes)))
+            else:
+                cer = X509.derRead(der)
+                eku = cer.getEKU()
+                keys = ()
+                if eku is not None and rpki.oids.id_kp_bgpsec_router in eku:
+                    ski = cer.getSKI()
+                    key = cer.getPublicKey().derWritePublic()
+                    keys = tuple((asn, ski, key) for asn in cer.asns)
+                result.append(("cer", sha256, keys))
+        except Exception, e:
+            logging.warning("# Couldn't decode %s: %s", uri, e)
+    return result
+
+
+class VRPCache(object):
+    """
+    Data extracted from the ROAs and router certificates in rcynicng's
+    database, keyed by the SHA-256 of each object.  Saved between runs,
+    so that we only have to fetch and decode objects which are new
+    since the last run; the decoding itself can be spread across a
+    pool of worker processes.
+    """
+
+    format_version = 1
+
+    def __init__(self, filename = None):
+        self.filename = filename
+        self.roas = {}
+        self.routercerts = {}
+        if filename:
+            try:
+                with open(filename, "rb") as f:
+                    saved = cPickle.load(f)
+                if saved.get("format_version") == self.format_version:
+                    self.roas = saved["roas"]
+                    self.routercerts = saved["routercerts"]
+            except Exception, e:
+                logging.debug("# Couldn't load VRP cache %s, starting fresh: %s", filename, e)
+
+    def update(self, workers = 0, batch_size = 100):
+        """
+        Bring the cache in line with the latest authenticated set:
+        decode whatever we haven't seen before, forget whatever has
+        gone away.
+        """
+
+        # Fork the pool before touching the database, so the workers
+        # don't inherit an open database connection.
+        pool = multiprocessing.Pool(workers) if workers > 0 else None
+        try:
+            auth = rpki.rcynicdb.iterator.latest_authenticated()
+            roas = set()
+            routercerts = set()
+            if auth is not None:
+                roas.update(sha256 for sha256, uri in rpki.rcynicdb.iterator.authenticated_digests(auth, ".roa"))
+                routercerts.update(sha256 for sha256, uri in rpki.rcynicdb.iterator.authenticated_digests(auth, ".cer"))
+            for sha256 in set(self.roas) - roas:
+                del self.roas[sha256]
+            for sha256 in set(self.routercerts) - routercerts:
+                del self.routercerts[sha256]
+            missing = [sha256 for sha256 in roas if sha256 not in self.roas]
+            missing.extend(sha256 for sha256 in routercerts if sha256 not in self.routercerts)
+            logging.debug("# VRP cache: %d ROAs and %d certificates current, %d to decode",
+                          len(roas), len(routercerts), len(missing))
+            if not missing:
+                return
+            rows = rpki.rcynicdb.iterator.authenticated_der(auth, missing)
+            batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
+            results = itertools.imap(decode_objects, batches) if pool is None else pool.imap_unordered(decode_objects, batches)
+            for batch in results:
+                for kind, sha256, data in batch:
+                    if kind == "roa":
+                        self.roas[sha256] = data
+                    else:
+                        self.routercerts[sha256] = data
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def save(self):
+        """
+        Save the cache for the next run.
+        """
+
+        if self.filename:
+            tmpfn = "%s.%d.tmp" % (self.filename, os.getpid())
+            with open(tmpfn, "wb") as f:
+                cPickle.dump(dict(format_version = self.format_version,
+                                  roas = self.roas,
+                                  routercerts = self.routercerts),
+                             f, cPickle.HIGHEST_PROTOCOL)
+            os.rename(tmpfn, self.filename)
+
+    def prefix_pdus(self, version):
+        """
+        Generate wire format prefix PDUs for every cached ROA.
+        """
+
+        wire_from_vrp = PrefixPDU.wire_from_vrp
+        for asn, prefixes in self.roas.itervalues():
+            for address, length, maxlength in prefixes:
+                yield wire_from_vrp(version, asn, address, length, maxlength)
+
+    def routerkey_pdus(self, version):
+        """
+        Generate wire format router key PDUs for every cached router certificate.
+        """
+
+        for keys in self.routercerts.itervalues():
+            for asn, ski, key in keys:
+                yield RouterKeyPDU.from_certificate(version = version, asn = asn, ski = ski, key = key).to_pdu()
+
+
 class PDUSet(list):
     """
     Object representing a set of PDUs, that is, one versioned and
     (theoretically) consistant set of prefixes and router keys extracted
     from rcynic's output.
+
+    To keep memory use and sort time down when there are millions of
+    these, a PDUSet holds the wire format of each PDU as a string
+    rather than a PDU object.  The protocol already orders PDUs by
+    their wire format, so sorting, deduplicating, saving, and diffing
+    can all work on the strings directly; use .pdus() to get PDU
+    objects back for display.
     """
 
+    # Offset of the announce/withdraw flag in each PDU type we store.
+    announce_offset = { IPv4PrefixPDU.pdu_type : 8,
+                        IPv6PrefixPDU.pdu_type : 8,
+                        RouterKeyPDU.pdu_type  : 2 }
+
     def __init__(self, version):
         assert version in rpki.rtr.pdus.PDU.version_map
         super(PDUSet, self).__init__()
@@ -194,22 +370,69 @@ class PDUSet(list):
     def _load_file(cls, filename, version):
         """
         Low-level method to read PDUSet from a file.
+
+        Our own data files only contain PDUs of types we stored, so
+        rather than parsing each PDU we map the file and split it into
+        records: runs of fixed-size prefix PDUs via the bulk scanner,
+        anything else using the length field in each PDU header.
         """
 
         self = cls(version = version)
-        f = open(filename, "rb")
+        with open(filename, "rb") as f:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            except ValueError:
+                return self             # Empty file
+        try:
+            unpack_from = rpki.rtr.pdus.PDU.header_struct.unpack_from
+            header_size = rpki.rtr.pdus.PDU.header_struct.size
+            offset = 0
+            end = len(m)
+            while offset < end:
+                pdu_version, pdu_type, length, count = rpki.rtr.pdus.scan_prefix_run(m, offset, end)
+                if count > 0 and pdu_version == version:
+                    self.extend(m[i : i + length] for i in xrange(offset, offset + length * count, length))
+                    offset += length * count
+                    continue
+                if end - offset < header_size:
+                    raise rpki.rtr.pdus.CorruptData("Truncated PDU header at offset %d in %s" % (offset, filename))
+                pdu_version, pdu_type, length = unpack_from(m, offset)
+                if pdu_version != version or pdu_type not in self.announce_offset or length < 8 or offset + length > end:
+                    raise rpki.rtr.pdus.CorruptData("Bad PDU header at offset %d in %s" % (offset, filename))
+                self.append(m[offset:offset + length])
+                offset += length
+        finally:
+            m.close()
+        return self
+
+    @classmethod
+    def with_announce(cls, pdu, announce):
+        """
+        Return wire format PDU with the announce flag set to announce.
+        """
+
+        i = cls.announce_offset[ord(pdu[1])]
+        return pdu[:i] + chr(announce) + pdu[i+1:]
+
+    def sort_and_dedup(self):
+        """
+        Sort this PDUSet into wire order and remove duplicates.
+        """
+
+        self.sort()
+        self[:] = [pdu for pdu, dups in itertools.groupby(self)]
+
+    def pdus(self):
+        """
+        Iterate over this PDUSet as PDU objects.
+        """
+
         r = rpki.rtr.channels.ReadBuffer()
-        while True:
+        for pdu in self:
+            r.put(pdu)
             p = rpki.rtr.pdus.PDU.read_pdu(r)
-            while p is None:
-                b = f.read(r.needed())
-                if b == "":
-                    assert r.available() == 0
-                    return self
-                r.put(b)
-                p = r.retry()
-            assert p.version == self.version
-            self.append(p)
+            assert p is not None and r.available() == 0
+            yield p
 
     @staticmethod
     def seq_ge(a, b):
@@ -229,7 +452,7 @@ class AXFRSet(PDUSet):
     serial = None
 
     @classmethod
-    def parse_rcynic(cls, rcynic_dir, version, scan_roas = None, scan_routercerts = None):
+    def parse_rcynic(cls, rcynic_dir, version, scan_roas = None, scan_routercerts = None, vrp_cache = None):
         """
         Parse ROAS and router certificates fetched (and validated!) by
         rcynic to create a new AXFRSet.
@@ -241,6 +464,9 @@ class AXFRSet(PDUSet):
         At some point the ability to parse these data from external
         programs may move to a separate constructor function, so that we
         can make this one a bit simpler and faster.
+
+        If we're given an up-to-date VRPCache, we take ROA and router
+        certificate data from it rather than decoding objects here.
         """
 
         self = cls(version = version)
@@ -248,20 +474,26 @@ class AXFRSet(PDUSet):
 
         include_routercerts = RouterKeyPDU.pdu_type in rpki.rtr.pdus.PDU.version_map[version]
 
-        if scan_roas is None:
+        if scan_roas is None and vrp_cache is not None:
+            self.extend(vrp_cache.prefix_pdus(version))
+
+        elif scan_roas is None:
             for uri, roa in authenticated_objects(rcynic_dir, uri_suffix = ".roa", class_map = self.class_map):
                 roa.extractWithoutVerifying()
                 asn = roa.getASID()
-                self.extend(PrefixPDU.from_roa(version = version, asn = asn, prefix_tuple = prefix_tuple)
+                self.extend(PrefixPDU.wire_from_roa(version = version, asn = asn, prefix_tuple = prefix_tuple)
                             for prefix_tuple in roa.prefixes)
 
-        if scan_routercerts is None and include_routercerts:
+        if scan_routercerts is None and include_routercerts and vrp_cache is not None:
+            self.extend(vrp_cache.routerkey_pdus(version))
+
+        elif scan_routercerts is None and include_routercerts:
             for uri, cer in authenticated_objects(rcynic_dir, uri_suffix = ".cer", class_map = self.class_map):
                 eku = cer.getEKU()
                 if eku is not None and rpki.oids.id_kp_bgpsec_router in eku:
                     ski = cer.getSKI()
                     key = cer.getPublicKey().derWritePublic()
-                    self.extend(RouterKeyPDU.from_certificate(version = version, asn = asn, ski = ski, key = key)
+                    self.extend(RouterKeyPDU.from_certificate(version = version, asn = asn, ski = ski, key = key).to_pdu()
                                 for asn in cer.asns)
 
         if scan_roas is not None:
@@ -270,7 +502,7 @@ class AXFRSet(PDUSet):
                 for line in p.stdout:
                     line = line.split()
                     asn = line[1]
-                    self.extend(PrefixPDU.from_text(version = version, asn = asn, addr = addr)
+                    self.extend(PrefixPDU.from_text(version = version, asn = asn, addr = addr).to_pdu()
                                 for addr in line[2:])
             except OSError, e:
                 sys.exit("Could not run %s: %s" % (scan_roas, e))
@@ -282,15 +514,12 @@ class AXFRSet(PDUSet):
                     line = line.split()
                     gski = line[0]
                     key  = line[-1]
-                    self.extend(RouterKeyPDU.from_text(version = version, asn = asn, gski = gski, key = key)
+                    self.extend(RouterKeyPDU.from_text(version = version, asn = asn, gski = gski, key = key).to_pdu()
                                 for asn in line[1:-1])
             except OSError, e:
                 sys.exit("Could not run %s: %s" % (scan_routercerts, e))
 
-        self.sort()
-        for i in xrange(len(self) - 2, -1, -1):
-            if self[i] == self[i + 1]:
-                del self[i + 1]
+        self.sort_and_dedup()
         return self
 
     @classmethod
@@ -333,8 +562,7 @@ class AXFRSet(PDUSet):
         """
 
         f = open(self.filename(), "wb")
-        for p in self:
-            f.write(p.to_pdu())
+        f.writelines(self)
         f.close()
 
     def destroy_old_data(self):
@@ -366,7 +594,7 @@ class AXFRSet(PDUSet):
         """
         Save current serial number and nonce, creating new nonce if
         necessary.  Creating a new nonce triggers cleanup of old state, as
-        the new nonce invalidates all old serial numbers.
+        the new nonce invalidates all old serial numbers.  Returns the nonce.
         """
 
         assert self.version in rpki.rtr.pdus.PDU.version_map
@@ -376,16 +604,18 @@ class AXFRSet(PDUSet):
             nonce = self.new_nonce(force_zero_nonce)
             self.destroy_old_data()
         rpki.rtr.server.write_current(self.serial, nonce, self.version)
+        return nonce
 
-    def save_ixfr(self, other):
+    def ixfr(self, other):
         """
-        Comparing this AXFRSet with an older one and write the resulting
-        IXFRSet to file with magic filename.  Since we store PDUSets
-        in sorted order, computing the difference is a trivial linear
-        comparison.
+        Compare this AXFRSet with an older one and return the resulting
+        IXFRSet.  Since we store PDUSets in sorted order, computing the
+        difference is a trivial linear comparison.
         """
 
-        f = open("%d.ix.%d.v%d" % (self.serial, other.serial, self.version), "wb")
+        result = IXFRSet(version = self.version)
+        result.from_serial = other.serial
+        result.to_serial = self.serial
         old = other
         new = self
         len_old = len(old)
@@ -393,19 +623,27 @@ class AXFRSet(PDUSet):
         i_old = i_new = 0
         while i_old < len_old and i_new < len_new:
             if old[i_old] < new[i_new]:
-                f.write(old[i_old].to_pdu(announce = 0))
+                result.append(self.with_announce(old[i_old], 0))
                 i_old += 1
             elif old[i_old] > new[i_new]:
-                f.write(new[i_new].to_pdu(announce = 1))
+                result.append(new[i_new])
                 i_new += 1
             else:
                 i_old += 1
                 i_new += 1
-        for i in xrange(i_old, len_old):
-            f.write(old[i].to_pdu(announce = 0))
-        for i in xrange(i_new, len_new):
-            f.write(new[i].to_pdu(announce = 1))
-        f.close()
+        result.extend(self.with_announce(old[i], 0) for i in xrange(i_old, len_old))
+        result.extend(new[i_new:])
+        return result
+
+    def save_ixfr(self, other):
+        """
+        Comparing this AXFRSet with an older one and write the resulting
+        IXFRSet to file with magic filename.  Returns the IXFRSet.
+        """
+
+        result = self.ixfr(other)
+        result.save()
+        return result
 
     def show(self):
         """
@@ -413,7 +651,7 @@ class AXFRSet(PDUSet):
         """
 
         logging.debug("# AXFR %d (%s) v%d", self.serial, self.serial, self.version)
-        for p in self:
+        for p in self.pdus():
             logging.debug(p)
 
 
@@ -450,6 +688,52 @@ class IXFRSet(PDUSet):
 
         return "%d.ix.%d.v%d" % (self.to_serial, self.from_serial, self.version)
 
+    def save(self):
+        """
+        Write IXFRSet to file with magic filename.
+        """
+
+        f = open(self.filename(), "wb")
+        f.writelines(self)
+        f.close()
+
+    def compose(self, other):
+        """
+        Compose this IXFRSet with another one which starts where this
+        one ends, returning an IXFRSet which goes straight from our
+        starting serial to the other one's ending serial.
+
+        Both sets are sorted on the announced form of their PDUs, so
+        this is a linear merge: a PDU which only changed in one set
+        keeps that change, a PDU announced in one set and withdrawn in
+        the other cancels out, and anything else takes the later change.
+        """
+
+        assert self.version == other.version and self.to_serial == other.from_serial
+        result = IXFRSet(version = self.version)
+        result.from_serial = self.from_serial
+        result.to_serial = other.to_serial
+        old = [self.with_announce(pdu, 1) for pdu in self]
+        new = [self.with_announce(pdu, 1) for pdu in other]
+        len_old = len(old)
+        len_new = len(new)
+        i_old = i_new = 0
+        while i_old < len_old and i_new < len_new:
+            if old[i_old] < new[i_new]:
+                result.append(self[i_old])
+                i_old += 1
+            elif old[i_old] > new[i_new]:
+                result.append(other[i_new])
+                i_new += 1
+            else:
+                if self[i_old] == other[i_new]:
+                    result.append(other[i_new])
+                i_old += 1
+                i_new += 1
+        result.extend(self[i_old:])
+        result.extend(other[i_new:])
+        return result
+
     def show(self):
         """
         Print this IXFRSet.
@@ -459,13 +743,15 @@ class IXFRSet(PDUSet):
                       self.from_serial, self.from_serial,
                       self.to_serial,   self.to_serial,
                       self.version)
-        for p in self:
+        for p in self.pdus():
             logging.debug(p)
 
 
-def kick_all(serial):
+def kick_all(serial, nonce = None, version = None):
     """
-    Kick any existing server processes to wake them up.
+    Kick any existing server processes to wake them up.  If we know the
+    protocol version and nonce, include them along with the serial, so
+    that servers don't have to go reread current.vN.
     """
 
     try:
@@ -474,7 +760,10 @@ def kick_all(serial):
         logging.debug('# Creating directory "%s"', rpki.rtr.server.kickme_dir)
         os.makedirs(rpki.rtr.server.kickme_dir)
 
-    msg = "Good morning, serial %d is ready" % serial
+    if nonce is None or version is None:
+        msg = "Good morning, serial %d is ready" % serial
+    else:
+        msg = rpki.rtr.server.kick_message(version, serial, nonce)
     sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
     for name in glob.iglob("%s.*" % rpki.rtr.server.kickme_base):
         try:
@@ -511,6 +800,15 @@ def cronjob_main(args):
             logging.critical(str(e))
             sys.exit(1)
 
+    # When reading rcynicng's database rather than an old-style
+    # directory tree, decode new objects once up front for all
+    # protocol versions, reusing whatever we decoded on earlier runs.
+
+    vrp_cache = None
+    if not args.rcynic_dir and not (args.scan_roas and args.scan_routercerts):
+        vrp_cache = VRPCache(args.vrp_cache)
+        vrp_cache.update(workers = args.decode_workers)
+
     for version in sorted(rpki.rtr.server.PDU.version_map.iterkeys(), reverse = True):
 
         logging.debug("# Generating updates for protocol version %d", version)
@@ -525,19 +823,40 @@ def cronjob_main(args):
                 logging.debug("# Deleting old file %s, timestamp %s", f, t)
                 os.unlink(f)
 
-        pdus = rpki.rtr.generator.AXFRSet.parse_rcynic(args.rcynic_dir, version, args.scan_roas, args.scan_routercerts)
-        if pdus == rpki.rtr.generator.AXFRSet.load_current(version):
+        pdus = rpki.rtr.generator.AXFRSet.parse_rcynic(args.rcynic_dir, version, args.scan_roas, args.scan_routercerts, vrp_cache)
+        previous = rpki.rtr.generator.AXFRSet.load_current(version)
+        if pdus == previous:
             logging.debug("# No change, new serial not needed")
             continue
         pdus.save_axfr()
+
+        # Rather than diffing against every AXFR in the window, diff
+        # against the previous AXFR once, then extend each of the
+        # previous run's IXFRs with that delta.  Only AXFRs for which
+        # we have no chain get loaded and diffed the hard way.
+
+        delta = None if previous is None else pdus.save_ixfr(previous)
         for axfr in glob.iglob("*.ax.v%d" % version):
-            if axfr != pdus.filename():
+            if axfr == pdus.filename() or (previous is not None and axfr == previous.filename()):
+                continue
+            chain = None
+            if previous is not None:
+                try:
+                    chain = rpki.rtr.generator.IXFRSet.load("%d.ix.%s.v%d" % (previous.serial, axfr.split(".")[0], version))
+                except IOError:
+                    pass
+                except rpki.rtr.pdus.CorruptData, e:
+                    logging.warning("# Ignoring corrupt IXFR chain for %s: %s", axfr, e)
+            if chain is None:
+                logging.debug("# No IXFR chain for %s, diffing against it directly", axfr)
                 pdus.save_ixfr(rpki.rtr.generator.AXFRSet.load(axfr))
-        pdus.mark_current(args.force_zero_nonce)
+            else:
+                chain.compose(delta).save()
+        nonce = pdus.mark_current(args.force_zero_nonce)
 
         logging.debug("# New serial is %d (%s)", pdus.serial, pdus.serial)
 
-        rpki.rtr.generator.kick_all(pdus.serial)
+        rpki.rtr.generator.kick_all(pdus.serial, nonce, version)
 
         old_ixfrs.sort()
         for ixfr in old_ixfrs:
@@ -547,6 +866,9 @@ def cronjob_main(args):
             except OSError:
                 pass
 
+    if vrp_cache is not None:
+        vrp_cache.save()
+
 
 def show_main(args):
     """
@@ -580,6 +902,10 @@ def argparse_setup(subparsers):
     subparser.add_argument("--scan-roas", help = "specify an external scan_roas program")
     subparser.add_argument("--scan-routercerts", help = "specify an external scan_routercerts program")
     subparser.add_argument("--force_zero_nonce", action = "store_true", help = "force nonce value of zero")
+    subparser.add_argument("--decode-workers", type = int, default = 0,
+                           help = "number of worker processes for decoding ROAs and router certificates")
+    subparser.add_argument("--vrp-cache", default = "vrp-cache.pickle",
+                           help = "file in which to cache data decoded from rcynicng's database")
     subparser.add_argument("rcynic_dir", nargs = "?", help = "directory containing validated rcynic output tree")
     subparser.add_argument("rpki_rtr_dir", nargs = "?", help = "directory containing RPKI-RTR database")
 
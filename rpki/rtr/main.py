@@ -38,6 +38,8 @@ def main():
     from rpki.rtr.server    import argparse_setup as argparse_setup_server
     from rpki.rtr.client    import argparse_setup as argparse_setup_client
     from rpki.rtr.generator import argparse_setup as argparse_setup_generator
+    from rpki.rtr.bench     import argparse_setup as argparse_setup_bench
+    from rpki.rtr.query     import argparse_setup as argparse_setup_query
 
     if "rpki.rtr.bgpdump" in sys.modules:
         from rpki.rtr.bgpdump import argparse_setup as argparse_setup_bgpdump
@@ -52,6 +54,8 @@ def main():
     argparse_setup_server(subparsers)
     argparse_setup_client(subparsers)
     argparse_setup_generator(subparsers)
+    argparse_setup_bench(subparsers)
+    argparse_setup_query(subparsers)
     argparse_setup_bgpdump(subparsers)
     args = cfg.argparser.parse_args()
 
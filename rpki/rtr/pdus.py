@@ -145,7 +145,7 @@ class PDU(object):
         if not reader.ready():
             return None
         assert reader.available() >= cls.header_struct.size
-        version, pdu_type, length = cls.header_struct.unpack(reader.buffer[:cls.header_struct.size])
+        version, pdu_type, length = reader.unpack(cls.header_struct)
         reader.check_version(version)
         if pdu_type not in cls.version_map[version]:
             raise UnsupportedPDUType(
@@ -498,7 +498,20 @@ class PrefixPDU(PDU):
             raise CorruptData("Got PDU length %d, expected %d" % (length, len(b1) + len(b2) + len(b3)), pdu = self)
         self.prefix = rpki.POW.IPAddress.fromBytes(b2)
         self.asn = self.asnum_struct.unpack(b3)[0]
-        assert b1 + b2 + b3 == self.to_pdu()
+        return self
+
+    @classmethod
+    def from_fields(cls, version, announce, prefixlen, max_prefixlen, address, asn):
+        """
+        Construct a prefix from fields returned by decode_prefix_run().
+        """
+
+        self = cls(version = version)
+        self.announce = announce
+        self.prefixlen = prefixlen
+        self.max_prefixlen = max_prefixlen
+        self.prefix = rpki.POW.IPAddress.fromBytes(address)
+        self.asn = asn
         return self
 
 
@@ -520,6 +533,57 @@ class IPv6PrefixPDU(PrefixPDU):
     pdu_type = 6
     address_byte_count = 16
 
+
+# Bulk decoding of prefix PDUs.  Nearly all of any large transfer is
+# runs of IPv4 or IPv6 prefix PDUs, which are fixed-size and whose
+# first eight bytes are the same for every PDU of a given version and
+# type, so we can find the extent of a run just by comparing headers
+# and decode it with one precompiled struct per PDU.
+
+prefix_run_structs = dict((cls.pdu_type, struct.Struct("!8xBBBx%dsL" % cls.address_byte_count))
+                          for cls in (IPv4PrefixPDU, IPv6PrefixPDU))
+
+def scan_prefix_run(buf, offset, end):
+    """
+    Find the run of consecutive complete prefix PDUs of a single type
+    starting at offset in buf.  Returns (version, pdu_type, size, count);
+    count is zero if there's no such run.
+    """
+
+    if end - offset < PDU.header_struct.size:
+        return None, None, 0, 0
+    version, pdu_type, size = PDU.header_struct.unpack_from(buf, offset)
+    if (pdu_type not in prefix_run_structs or
+        size != prefix_run_structs[pdu_type].size or
+        version not in PDU.version_map):
+        return None, None, 0, 0
+    header = buf[offset : offset + PDU.header_struct.size]
+    count = 0
+    while offset + size <= end and buf[offset : offset + PDU.header_struct.size] == header:
+        offset += size
+        count += 1
+    return version, pdu_type, size, count
+
+def decode_prefix_run(buf, offset, end):
+    """
+    Decode the run of prefix PDUs (if any) starting at offset in buf.
+    Returns (version, pdu_type, fields, offset), where fields is a list
+    of (announce, prefixlen, max_prefixlen, address, asn) tuples, and
+    offset points just past the run.
+    """
+
+    version, pdu_type, size, count = scan_prefix_run(buf, offset, end)
+    if count == 0:
+        return version, pdu_type, [], offset
+    unpack_from = prefix_run_structs[pdu_type].unpack_from
+    bits = (size - 16) * 8              # Prefix PDUs are 16 bytes plus address
+    fields = [unpack_from(buf, i) for i in xrange(offset, offset + size * count, size)]
+    for announce, prefixlen, max_prefixlen, address, asn in fields:
+        if announce > 1 or max_prefixlen < prefixlen or max_prefixlen > bits:
+            raise CorruptData("Implausible prefix PDU: announce %d prefixlen %d max_prefixlen %d" % (
+                announce, prefixlen, max_prefixlen))
+    return version, pdu_type, fields, offset + size * count
+
 @wire_pdu_only(1)
 class RouterKeyPDU(PDU):
     """
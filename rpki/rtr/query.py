@@ -0,0 +1,281 @@
+# $Id$
+#
+# Copyright (C) 2014  Dragon Research Labs ("DRL")
+#
+# Permission to use, copy, modify, and distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notices and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND DRL DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS.  IN NO EVENT SHALL DRL BE LIABLE FOR ANY
+# SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+VRP query service: covering, covered, and origin validation lookups
+against the current contents of the RPKI-RTR database.
+"""
+
+import os
+import sys
+import json
+import socket
+import bisect
+import urlparse
+import logging
+import BaseHTTPServer
+import rpki.rtr.pdus
+import rpki.rtr.server
+import rpki.rtr.generator
+
+
+class BadQuery(Exception):
+    "Malformed query."
+
+
+def parse_prefix(text):
+    """
+    Parse "address/length" (or a bare address) into (bits, network,
+    length), where bits is 32 or 128 and network is an integer.
+    """
+
+    address, sep, length = text.partition("/")
+    af, bits = (socket.AF_INET6, 128) if ":" in address else (socket.AF_INET, 32)
+    try:
+        network = long(socket.inet_pton(af, address).encode("hex"), 16)
+        length = int(length) if sep else bits
+    except (socket.error, ValueError):
+        raise BadQuery("Can't parse prefix %r" % text)
+    if length < 0 or length > bits:
+        raise BadQuery("Bad prefix length in %r" % text)
+    return bits, network & ~((1 << (bits - length)) - 1), length
+
+
+def parse_asn(text):
+    """
+    Parse an AS number, with or without an "AS" prefix.
+    """
+
+    digits = str(text).strip()
+    if digits[:2].upper() == "AS":
+        digits = digits[2:]
+    if not digits.isdigit() or long(digits) > 0xFFFFFFFF:
+        raise BadQuery("Can't parse origin AS %r" % text)
+    return long(digits)
+
+
+def format_prefix(bits, network, length):
+    """
+    Inverse of parse_prefix().
+    """
+
+    af = socket.AF_INET6 if bits == 128 else socket.AF_INET
+    return "%s/%d" % (socket.inet_ntop(af, ("%0*x" % (bits / 4, network)).decode("hex")), length)
+
+
+class VRPIndex(object):
+    """
+    Interval index over the VRPs in an AXFRSet.
+
+    For each address family and prefix length we keep a sorted list of
+    network numbers, with a parallel list of (max_prefixlen, asn) tuples
+    for the VRPs on each network.  That's a radix tree flattened by
+    level: a covering lookup is one bisect per populated length at or
+    above the query, a covered lookup is one range bisect per populated
+    length below it, so lookups cost at most a few dozen bisects no
+    matter how many VRPs there are.
+    """
+
+    def __init__(self, axfr):
+        self.serial = axfr.serial
+        self.version = axfr.version
+        self.count = 0
+        vrps = {}
+        for pdu in axfr:
+            pdu_type = ord(pdu[1])
+            if pdu_type not in rpki.rtr.pdus.prefix_run_structs:
+                continue
+            announce, prefixlen, max_prefixlen, address, asn = rpki.rtr.pdus.prefix_run_structs[pdu_type].unpack(pdu)
+            bits = len(address) * 8
+            vrps.setdefault((bits, prefixlen), {}).setdefault(long(address.encode("hex"), 16), []).append((max_prefixlen, asn))
+            self.count += 1
+        self.levels = {}
+        for (bits, prefixlen), networks in vrps.iteritems():
+            keys = sorted(networks)
+            self.levels.setdefault(bits, []).append((prefixlen, keys, [networks[k] for k in keys]))
+        for levels in self.levels.itervalues():
+            levels.sort()
+
+    def covering(self, bits, network, length):
+        """
+        Return VRPs whose prefixes cover (are equal to or less specific
+        than) the given prefix, as (bits, network, prefixlen, max_prefixlen, asn) tuples.
+        """
+
+        result = []
+        for prefixlen, keys, values in self.levels.get(bits, ()):
+            if prefixlen > length:
+                break
+            masked = network & ~((1 << (bits - prefixlen)) - 1)
+            i = bisect.bisect_left(keys, masked)
+            if i < len(keys) and keys[i] == masked:
+                result.extend((bits, masked, prefixlen, m, a) for m, a in values[i])
+        return result
+
+    def covered(self, bits, network, length):
+        """
+        Return VRPs whose prefixes are covered by (are equal to or more
+        specific than) the given prefix.
+        """
+
+        result = []
+        last = network | ((1 << (bits - length)) - 1)
+        for prefixlen, keys, values in self.levels.get(bits, ()):
+            if prefixlen < length:
+                continue
+            lo = bisect.bisect_left(keys, network)
+            hi = bisect.bisect_right(keys, last)
+            for i in xrange(lo, hi):
+                result.extend((bits, keys[i], prefixlen, m, a) for m, a in values[i])
+        return result
+
+    def validate(self, bits, network, length, origin):
+        """
+        RFC 6811 route origin validation.  Returns the state ("valid",
+        "invalid", or "not-found") and the covering VRPs.
+        """
+
+        covering = self.covering(bits, network, length)
+        if not covering:
+            return "not-found", covering
+        if any(asn == origin and asn != 0 and length <= max_prefixlen
+               for b, n, prefixlen, max_prefixlen, asn in covering):
+            return "valid", covering
+        return "invalid", covering
+
+    def query(self, operation, prefix, asn = None):
+        """
+        Run one query, returning a JSON-friendly dict.
+        """
+
+        bits, network, length = parse_prefix(prefix)
+        result = dict(serial = long(self.serial), prefix = format_prefix(bits, network, length))
+        if operation == "covering":
+            vrps = self.covering(bits, network, length)
+        elif operation == "covered":
+            vrps = self.covered(bits, network, length)
+        elif operation == "validate":
+            asn = parse_asn(asn)
+            result["origin"] = asn
+            result["state"], vrps = self.validate(bits, network, length, asn)
+        else:
+            raise BadQuery("Unknown operation %r" % operation)
+        result["vrps"] = [dict(prefix = format_prefix(b, n, l), max_length = m, asn = a) for b, n, l, m, a in vrps]
+        return result
+
+
+class IndexLoader(object):
+    """
+    Keep a VRPIndex for the current serial of one protocol version,
+    rebuilding it when the cronjob publishes a new serial.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.index = None
+
+    def get(self):
+        serial = rpki.rtr.server.read_current(self.version)[0]
+        if serial is None:
+            raise BadQuery("No current data for protocol version %d" % self.version)
+        if self.index is None or self.index.serial != serial:
+            started = os.times()[4]
+            axfr = rpki.rtr.generator.AXFRSet.load("%d.ax.v%d" % (serial, self.version))
+            self.index = VRPIndex(axfr)
+            logging.info("[Indexed %d VRPs from serial %d in %.3fs]", self.index.count, serial, os.times()[4] - started)
+        return self.index
+
+
+class QueryHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    HTTP front end: GET /covering?prefix=P, /covered?prefix=P, or
+    /validate?prefix=P&asn=N, returning JSON.
+    """
+
+    loader = None
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query))
+        try:
+            if "prefix" not in params:
+                raise BadQuery("Missing prefix parameter")
+            body = self.loader.get().query(url.path.strip("/"), params["prefix"], params.get("asn"))
+            code = 200
+        except BadQuery, e:
+            body = dict(error = str(e))
+            code = 400
+        body = json.dumps(body)
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logging.debug("[%s] " + fmt, self.client_address[0], *args)
+
+
+def query_main(args):
+    """
+    Look up VRPs in the current RPKI-RTR database: VRPs covering a
+    prefix, VRPs covered by a prefix, or the RFC 6811 origin validation
+    state of a route.  Results are JSON.  The "http" operation runs a
+    small local HTTP server answering the same queries, which keeps
+    the index in memory and rebuilds it when the serial changes.
+    """
+
+    if args.rpki_rtr_dir:
+        try:
+            os.chdir(args.rpki_rtr_dir)
+        except OSError, e:
+            sys.exit(e)
+
+    loader = IndexLoader(max(rpki.rtr.pdus.PDU.version_map) if args.force_version is None else args.force_version)
+
+    if args.operation == "http":
+        QueryHandler.loader = loader
+        loader.get()
+        httpd = BaseHTTPServer.HTTPServer((args.address, args.port), QueryHandler)
+        logging.info("[Listening on %s port %d]", args.address, args.port)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    if len(args.operands) != (2 if args.operation == "validate" else 1):
+        sys.exit("Usage: query covering PREFIX | query covered PREFIX | query validate PREFIX ASN | query http")
+    try:
+        sys.stdout.write(json.dumps(loader.get().query(args.operation, *args.operands), indent = 2) + "\n")
+    except BadQuery, e:
+        sys.exit(e)
+
+
+def argparse_setup(subparsers):
+    """
+    Set up argparse stuff for commands in this module.
+    """
+
+    subparser = subparsers.add_parser("query", description = query_main.__doc__,
+                                      help = "Query VRPs in RPKI-RTR database")
+    subparser.set_defaults(func = query_main, default_log_destination = "stderr")
+    subparser.add_argument("--rpki-rtr-dir", help = "directory containing RPKI-RTR database")
+    subparser.add_argument("--force-version", type = int, choices = rpki.rtr.pdus.PDU.version_map,
+                           help = "use data for specific protocol version")
+    subparser.add_argument("--address", default = "localhost", help = "address on which HTTP server listens")
+    subparser.add_argument("--port", type = int, default = 8323, help = "port on which HTTP server listens")
+    subparser.add_argument("operation", choices = ("covering", "covered", "validate", "http"), help = "query type")
+    subparser.add_argument("operands", nargs = "*", help = "prefix, and origin AS for validate")
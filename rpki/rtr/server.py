@@ -23,6 +23,7 @@ Server implementation for the RPKI-RTR protocol (RFC 6810 et sequalia).
 
 import os
 import sys
+import mmap
 import errno
 import socket
 import signal
@@ -57,10 +58,10 @@ class PDU(rpki.rtr.pdus.PDU):
         fn2 = os.path.splitext(filename)[1]
         assert fn2.startswith(".v") and fn2[2:].isdigit() and int(fn2[2:]) == server.version
 
-        f = open(filename, "rb")
+        data = server.open_payload(filename)
         server.push_pdu(CacheResponsePDU(version = server.version,
                                          nonce   = server.current_nonce))
-        server.push_file(f)
+        server.push_file(data)
         server.push_pdu(EndOfDataPDU(version = server.version,
                                      serial  = server.current_serial,
                                      nonce   = server.current_nonce,
@@ -159,7 +160,7 @@ class ErrorReportPDU(rpki.rtr.pdus.ErrorReportPDU):
         server.logger.error(self)
         if self.errno in self.fatal:
             server.logger.error("[Shutting down due to reported fatal protocol error]")
-            sys.exit(1)
+            server.shutdown()
 
 
 def read_current(version):
@@ -193,17 +194,64 @@ def write_current(serial, nonce, version):
     os.rename(tmpfn, curfn)
 
 
-class FileProducer(object):
+def kick_message(version, serial, nonce):
+    """
+    Construct the datagram the cronjob sends to kick servers: it
+    carries the new serial number and nonce, so that servers don't
+    have to go reread current.vN to find out what changed.
+    """
+
+    return "rpki-rtr-kick %d %d %d" % (version, serial, nonce)
+
+
+def parse_kick_message(data):
+    """
+    Parse a kick datagram, returning (version, serial, nonce), or None
+    if the datagram doesn't carry that information (eg, because it came
+    from an older cronjob), in which case the receiver should reread
+    current.vN instead.
+    """
+
+    try:
+        tag, version, serial, nonce = data.split()
+        if tag == "rpki-rtr-kick":
+            return int(version), int(serial), int(nonce)
+    except (AttributeError, ValueError):
+        pass
+    return None
+
+
+def map_file(f):
+    """
+    Map a data file read-only into memory, so that we can hand pieces
+    of it to the kernel without copying them into Python strings first.
+    Empty files can't be mapped, but there's nothing to send anyway.
+    """
+
+    try:
+        return mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    except ValueError:
+        return ""
+
+
+class BufferProducer(object):
     """
-    File-based producer object for asynchat.
+    Producer object for asynchat which hands out read-only views of a
+    string or memory-mapped file, so that sending a payload doesn't
+    allocate a Python string per chunk or copy it once per client.
     """
 
-    def __init__(self, handle, buffersize):
-        self.handle = handle
+    def __init__(self, data, buffersize):
+        self.data = data
         self.buffersize = buffersize
+        self.offset = 0
 
     def more(self):
-        return self.handle.read(self.buffersize)
+        if self.offset >= len(self.data):
+            return ""
+        b = buffer(self.data, self.offset, self.buffersize)
+        self.offset += self.buffersize
+        return b
 
 
 class ServerWriteChannel(rpki.rtr.channels.PDUChannel):
@@ -215,6 +263,8 @@ class ServerWriteChannel(rpki.rtr.channels.PDUChannel):
     server's output to a different file descriptor.
     """
 
+    ac_out_buffer_size = 65536
+
     def __init__(self):
         """
         Set up stdout.
@@ -230,13 +280,13 @@ class ServerWriteChannel(rpki.rtr.channels.PDUChannel):
 
         return False
 
-    def push_file(self, f):
+    def push_file(self, data):
         """
-        Write content of a file to stream.
+        Write content of a mapped file to stream.
         """
 
         try:
-            self.push_with_producer(FileProducer(f, self.ac_out_buffer_size))
+            self.push_with_producer(BufferProducer(data, self.ac_out_buffer_size))
         except OSError, e:
             if e.errno != errno.EAGAIN:
                 raise
@@ -292,12 +342,27 @@ class ServerChannel(rpki.rtr.channels.PDUChannel):
 
         return self.writer.push_pdu(pdu)
 
-    def push_file(self, f):
+    def push_file(self, data):
         """
         Redirect to writer channel.
         """
 
-        return self.writer.push_file(f)
+        return self.writer.push_file(data)
+
+    def open_payload(self, filename):
+        """
+        Open and map a data file for push_file().  Caller should catch IOError.
+        """
+
+        with open(filename, "rb") as f:
+            return map_file(f)
+
+    def shutdown(self):
+        """
+        Exit after a fatal protocol error.
+        """
+
+        sys.exit(1)
 
     def deliver_pdu(self, pdu):
         """
@@ -333,10 +398,22 @@ class ServerChannel(rpki.rtr.channels.PDUChannel):
         We have to check rather than just blindly notifying when kicked
         because the cronjob instance has no good way of knowing which
         protocol version we're running, thus has no good way of knowing
-        whether we care about a particular change set or not.
+        whether we care about a particular change set or not.  Current
+        cronjobs tell us the version, serial, and nonce in the kick, so
+        we only have to reread current.vN when talking to an old one.
         """
 
-        if force or self.check_serial():
+        kick = parse_kick_message(data)
+        if kick is None or self.version is None:
+            changed = self.check_serial()
+        elif kick[0] != self.version:
+            self.logger.debug("Cronjob kicked me about protocol version %d, ignoring", kick[0])
+            return
+        else:
+            changed = kick[1:] != (self.current_serial, self.current_nonce)
+            self.current_serial, self.current_nonce = kick[1:]
+
+        if force or changed:
             self.push_pdu(SerialNotifyPDU(version = self.version,
                                           serial  = self.current_serial,
                                           nonce   = self.current_nonce))
@@ -421,6 +498,279 @@ class KickmeChannel(asyncore.dispatcher, object):
         sys.exit(1)
 
 
+class PayloadCache(object):
+    """
+    In-memory cache of the current serial number, nonce, and AXFR/IXFR
+    payloads for each protocol version, shared by all the sessions of
+    a multiplexed server.  Payloads are mapped the first time somebody
+    asks for them and are discarded when the serial number changes;
+    sessions still sending an old payload keep their mapping alive.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.current = {}
+        self.payloads = {}
+
+    def refresh(self):
+        """
+        Reread current serial numbers and nonces for all versions and
+        return the set of versions which changed.
+        """
+
+        changed = set(version for version in PDU.version_map if self.set_current(version, *read_current(version)))
+        self.flush(changed)
+        return changed
+
+    def set_current(self, version, serial, nonce):
+        """
+        Record the current serial number and nonce for one protocol
+        version.  Return True if that changed anything.  Caller is
+        responsible for calling .flush() afterwards.
+        """
+
+        if (serial, nonce) == self.current.get(version):
+            return False
+        self.logger.debug("[Version %d now at serial %s nonce %s]", version, serial, nonce)
+        self.current[version] = (serial, nonce)
+        return True
+
+    def flush(self, changed):
+        """
+        Discard payloads which are no longer current and preload the
+        AXFR for each version in changed.
+        """
+
+        for filename in self.payloads.keys():
+            serial = int(filename.split(".", 1)[0])
+            version = int(filename.rsplit(".v", 1)[1])
+            if serial != self.current[version][0]:
+                del self.payloads[filename]
+        for version in changed:
+            serial = self.current[version][0]
+            if serial is not None:
+                try:
+                    self.get("%d.ax.v%d" % (serial, version))
+                except IOError, e:
+                    self.logger.warning("[Couldn't preload AXFR for version %d: %s]", version, e)
+
+    def get(self, filename):
+        """
+        Return the content of a data file, loading it if we haven't
+        already.  Caller should catch IOError.
+        """
+
+        try:
+            return self.payloads[filename]
+        except KeyError:
+            with open(filename, "rb") as f:
+                data = map_file(f)
+            self.payloads[filename] = data
+            self.logger.debug("[Cached %s, %d bytes]", filename, len(data))
+            return data
+
+
+class SessionChannel(rpki.rtr.channels.PDUChannel):
+    """
+    Server protocol engine for one client session of a multiplexed
+    server.  Same protocol logic as ServerChannel, but talks over a
+    socket, gets its data from the multiplexer's PayloadCache, and
+    closes the session rather than exiting when something goes wrong.
+    """
+
+    ac_out_buffer_size = 65536
+
+    def __init__(self, multiplexer, sock, addr):
+        super(SessionChannel, self).__init__(root_pdu_class = PDU, sock = sock)
+        self.multiplexer = multiplexer
+        self.logger = logging.LoggerAdapter(logging.root, dict(connection = addr_tag(addr)))
+        self.refresh = multiplexer.refresh
+        self.retry = multiplexer.retry
+        self.expire = multiplexer.expire
+        self.current_serial = self.current_nonce = None
+        multiplexer.sessions.add(self)
+        self.logger.debug("[Starting]")
+        self.start_new_pdu()
+
+    def deliver_pdu(self, pdu):
+        """
+        Handle received PDU.
+        """
+
+        pdu.serve(self)
+
+    def get_serial(self):
+        """
+        Fetch, cache, and return current serial number from the
+        multiplexer, or None if it doesn't have one for our version.
+        """
+
+        self.current_serial, self.current_nonce = self.multiplexer.cache.current.get(self.version, (None, None))
+        return self.current_serial
+
+    def check_serial(self):
+        """
+        Check for a new serial number.
+        """
+
+        old_serial = self.current_serial
+        return old_serial != self.get_serial()
+
+    def notify(self, data = None, force = False):
+        """
+        Multiplexer saw a serial number change: send a notify message if
+        it affects the protocol version this session is speaking.
+        """
+
+        if self.version is not None and (force or self.check_serial()):
+            self.push_pdu(SerialNotifyPDU(version = self.version,
+                                          serial  = self.current_serial,
+                                          nonce   = self.current_nonce))
+
+    def open_payload(self, filename):
+        """
+        Fetch a payload from the shared cache.  Caller should catch IOError.
+        """
+
+        return self.multiplexer.cache.get(filename)
+
+    def push_file(self, data):
+        """
+        Write a cached mapped payload to stream.
+        """
+
+        self.push_with_producer(BufferProducer(data, self.ac_out_buffer_size))
+
+    def shutdown(self):
+        """
+        Close this session after a fatal protocol error.
+        """
+
+        self.close()
+
+    def close(self):
+        """
+        Close this session and forget about it.
+        """
+
+        self.multiplexer.sessions.discard(self)
+        rpki.rtr.channels.PDUChannel.close(self)
+
+    def handle_close(self):
+        """
+        Client went away, clean up without exiting.
+        """
+
+        self.logger.debug("[Closing]")
+        self.close()
+
+    def handle_error(self):
+        """
+        Log and drop this session, without taking down the others.
+        """
+
+        self.logger.exception("[Unhandled exception, closing session]")
+        self.close()
+
+
+class Multiplexer(asyncore.dispatcher, object):
+    """
+    Single-process event-driven rpki-rtr server: accepts TCP
+    connections, runs a SessionChannel for each of them, and broadcasts
+    Serial Notify PDUs to all sessions when kicked by the generator.
+    """
+
+    def __init__(self, sock, refresh, retry, expire):
+        asyncore.dispatcher.__init__(self, sock)            # Old-style class
+        self.accepting = True                               # sock is already listening
+        self.logger = logging.LoggerAdapter(logging.root, dict(connection = "/multiplexer"))
+        self.refresh = refresh
+        self.retry = retry
+        self.expire = expire
+        self.sessions = set()
+        self.cache = PayloadCache(self.logger)
+        self.cache.refresh()
+
+    def writable(self):
+        """
+        Listening socket is never writable.
+        """
+
+        return False
+
+    def handle_accept(self):
+        """
+        Start a new session for an incoming connection.
+        """
+
+        try:
+            accepted = self.accept()
+        except socket.error, e:
+            self.logger.warning("[accept() failed: %s]", e)
+            return
+        if accepted is not None:
+            SessionChannel(self, *accepted)
+
+    def notify(self, data = None):
+        """
+        Generator kicked us: update serial numbers (from the kick if it
+        tells us, otherwise by rereading them) and tell every session
+        whose protocol version changed.
+        """
+
+        kick = parse_kick_message(data)
+        if kick is None:
+            changed = self.cache.refresh()
+        elif kick[0] in PDU.version_map and self.cache.set_current(*kick):
+            changed = set((kick[0],))
+            self.cache.flush(changed)
+        else:
+            changed = set()
+        if not changed:
+            self.logger.debug("Cronjob kicked me but I see no serial change, ignoring")
+            return
+        self.logger.debug("[Notifying %d sessions]", len(self.sessions))
+        for session in list(self.sessions):
+            if session.version in changed:
+                session.notify()
+
+    def log(self, msg):
+        """
+        Intercept asyncore's logging.
+        """
+
+        self.logger.info(msg)
+
+    def log_info(self, msg, tag = "info"):
+        """
+        Intercept asyncore's logging.
+        """
+
+        self.logger.info("asyncore: %s: %s", tag, msg)
+
+    def handle_error(self):
+        """
+        Handle errors caught by asyncore main loop.
+        """
+
+        self.logger.exception("[Unhandled exception]")
+        self.logger.critical("[Exiting after unhandled exception]")
+        sys.exit(1)
+
+
+def addr_tag(addr):
+    """
+    Construct hostname/address + port tag for a connection whose peer
+    address we already know.
+    """
+
+    host, port = addr[0:2]
+    if ":" in host:
+        return "/tcp/%s.%s" % (host, port)
+    else:
+        return "/tcp/%s:%s" % (host, port)
+
+
 def hostport_tag():
     """
     Construct hostname/address + port when we're running under a
@@ -502,18 +852,11 @@ def server_main(args):
             kickme.cleanup()
 
 
-def listener_main(args):
+def open_listener(port, backlog):
     """
-    Totally insecure TCP listener for rpki-rtr protocol.  We only
-    implement this because it's all that the routers currently support.
-    In theory, we will all be running TCP-AO in the future, at which
-    point this listener will go away or become a TCP-AO listener.
+    Open a dual-stack (where possible) TCP listening socket.
     """
 
-    # Perhaps we should daemonize?  Deal with that later.
-
-    # server_main() handles args.rpki_rtr_dir.
-
     listener = None
     try:
         listener = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
@@ -527,9 +870,25 @@ def listener_main(args):
         listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     except AttributeError:
         pass
-    listener.bind(("", args.port))
-    listener.listen(5)
-    logging.debug("[Listening on port %s]", args.port)
+    listener.bind(("", port))
+    listener.listen(backlog)
+    logging.debug("[Listening on port %s]", port)
+    return listener
+
+
+def listener_main(args):
+    """
+    Totally insecure TCP listener for rpki-rtr protocol.  We only
+    implement this because it's all that the routers currently support.
+    In theory, we will all be running TCP-AO in the future, at which
+    point this listener will go away or become a TCP-AO listener.
+    """
+
+    # Perhaps we should daemonize?  Deal with that later.
+
+    # server_main() handles args.rpki_rtr_dir.
+
+    listener = open_listener(args.port, 5)
     while True:
         try:
             s, ai = listener.accept()
@@ -557,6 +916,37 @@ def listener_main(args):
                 break
 
 
+def multiplexer_main(args):
+    """
+    Single-process TCP server for the rpki-rtr protocol.  Serves all
+    router sessions from one event loop instead of forking a server
+    per connection, keeps the current AXFR and IXFR payloads in
+    memory, and sends Serial Notify PDUs to all sessions at once when
+    the cronjob kicks it.
+    """
+
+    if args.rpki_rtr_dir:
+        try:
+            os.chdir(args.rpki_rtr_dir)
+        except OSError, e:
+            logging.error("[Couldn't chdir(%r), exiting: %s]", args.rpki_rtr_dir, e)
+            sys.exit(1)
+
+    kickme = None
+    try:
+        listener = open_listener(args.port, args.backlog)
+        multiplexer = Multiplexer(sock = listener, refresh = args.refresh, retry = args.retry, expire = args.expire)
+        kickme = KickmeChannel(server = multiplexer)
+        asyncore.loop(timeout = None)
+        signal.signal(signal.SIGINT, signal.SIG_IGN) # Theorized race condition
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN) # Observed race condition
+        if kickme is not None:
+            kickme.cleanup()
+
+
 def argparse_setup(subparsers):
     """
     Set up argparse stuff for commands in this module.
@@ -593,3 +983,13 @@ def argparse_setup(subparsers):
     subparser.add_argument("--expire",  type = expire,  help = "override default expire timer")
     subparser.add_argument("port",      type = int,     help = "TCP port on which to listen")
     subparser.add_argument("rpki_rtr_dir", nargs = "?", help = "directory containing RPKI-RTR database")
+
+    subparser = subparsers.add_parser("multiplexer", description = multiplexer_main.__doc__,
+                                      help = "Single-process TCP server for RPKI-RTR protocol")
+    subparser.set_defaults(func = multiplexer_main, default_log_destination = "syslog")
+    subparser.add_argument("--refresh", type = refresh, help = "override default refresh timer")
+    subparser.add_argument("--retry",   type = retry,   help = "override default retry timer")
+    subparser.add_argument("--expire",  type = expire,  help = "override default expire timer")
+    subparser.add_argument("--backlog", type = int, default = 128, help = "TCP listen() backlog")
+    subparser.add_argument("port",      type = int,     help = "TCP port on which to listen")
+    subparser.add_argument("rpki_rtr_dir", nargs = "?", help = "directory containing RPKI-RTR database")
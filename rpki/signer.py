@@ -0,0 +1,109 @@
+# $Id$
+#
+# Copyright (C) 2015-2016  Parsons Government Services ("PARSONS")
+#
+# Permission to use, copy, modify, and distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notices and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND PARSONS DISCLAIMS ALL
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS.  IN NO EVENT SHALL
+# PARSONS BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS
+# OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT,
+# NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION
+# WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Run signing operations off the tornado IOLoop.
+
+rpki.POW releases the GIL while OpenSSL does private key operations,
+so a handful of threads is enough to keep RSA signatures from
+stalling the IOLoop.  Functions run here must not touch the ORM: do
+the database work on the IOLoop, hand the signing to run(), and
+yield the future it returns.
+"""
+
+import sys
+import logging
+import multiprocessing.pool
+
+import tornado.ioloop
+import tornado.concurrent
+
+logger = logging.getLogger(__name__)
+
+## @var pool
+# Thread pool for signing operations, or None to run them inline.
+# Set by configure().
+
+pool = None
+
+
+class SigningPool(object):
+    """
+    Thread pool whose results come back as tornado Futures resolved on
+    the IOLoop which submitted them.
+    """
+
+    def __init__(self, threads):
+        self.ioloop  = tornado.ioloop.IOLoop.current()
+        self.threads = multiprocessing.pool.ThreadPool(threads)
+        self.pending = 0
+
+    def submit(self, func, *args, **kwargs):
+        future = tornado.concurrent.Future()
+        self.pending += 1
+
+        def done(setter, value):
+            self.pending -= 1
+            setter(value)
+
+        def worker():
+            try:
+                result = func(*args, **kwargs)
+            except:
+                self.ioloop.add_callback(done, future.set_exc_info, sys.exc_info())
+            else:
+                self.ioloop.add_callback(done, future.set_result, result)
+
+        self.threads.apply_async(worker)
+        return future
+
+
+def configure(threads):
+    """
+    Start a signing pool with the given number of threads.  Zero means
+    run signing operations inline.
+    """
+
+    global pool                         # pylint: disable=W0603
+    pool = SigningPool(threads) if threads > 0 else None
+    logger.debug("Signing pool: %s", "%d threads" % threads if pool else "inline")
+
+
+def run_inline(func, *args, **kwargs):
+    """
+    Run func() now, returning its result wrapped in an already-resolved
+    Future.  A coroutine which only yields futures like this runs to
+    completion before returning, which lets synchronous code use
+    coroutines built on run().
+    """
+
+    future = tornado.concurrent.Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except:
+        future.set_exc_info(sys.exc_info())
+    return future
+
+
+def run(func, *args, **kwargs):
+    """
+    Run func() in the signing pool, returning a Future for its result.
+    """
+
+    if pool is None:
+        return run_inline(func, *args, **kwargs)
+    return pool.submit(func, *args, **kwargs)
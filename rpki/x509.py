@@ -1234,6 +1234,13 @@ class PKCS10(DER_object):
 
 generate_insecure_debug_only_rsa_key = None
 
+## @var rsa_key_pool
+# Source of pre-generated RSA keys, if any.  rpkid points this at its
+# rpki.rpkid_keypool.KeyPool; when None, or when the pool comes up
+# empty, RSA.generate() generates keys on demand.
+
+rsa_key_pool = None
+
 class insecure_debug_only_rsa_key_generator(object):
 
     def __init__(self, filename, keyno = 0):
@@ -1404,12 +1411,15 @@ class RSA(PrivateKey):
         Generate a new keypair.
         """
 
-        if not quiet:
-            logger.debug("Generating new %d-bit RSA key", keylength)
         if generate_insecure_debug_only_rsa_key is not None:
             return cls(POW = generate_insecure_debug_only_rsa_key())
-        else:
-            return cls(POW = rpki.POW.Asymmetric.generateRSA(keylength))
+        if rsa_key_pool is not None:
+            key = rsa_key_pool.get(keylength)
+            if key is not None:
+                return cls(POW = key)
+        if not quiet:
+            logger.debug("Generating new %d-bit RSA key", keylength)
+        return cls(POW = rpki.POW.Asymmetric.generateRSA(keylength))
 
 class ECDSA(PrivateKey):
     """
@@ -1838,14 +1848,20 @@ class SignedManifest(DER_CMS_object):
         return self.get_POW().getNextUpdate()
 
     @classmethod
-    def build(cls, serial, thisUpdate, nextUpdate, names_and_objs, keypair, certs, version = 0):
+    def build(cls, serial, thisUpdate, nextUpdate, names_and_objs, keypair, certs, version = 0,
+              names_and_hashes = ()):
         """
-        Build a signed manifest.
+        Build a signed manifest.  Objects can be supplied either as
+        (name, object) pairs in names_and_objs, or as (name, SHA-256
+        digest) pairs in names_and_hashes when the caller already knows
+        the digests.
         """
 
         filelist = []
         for name, obj in names_and_objs:
             filelist.append((name.rpartition("/")[2], sha256(obj.get_DER())))
+        for name, digest in names_and_hashes:
+            filelist.append((name.rpartition("/")[2], digest))
         filelist.sort(key = lambda x: x[0])
 
         obj = cls.POW_class()